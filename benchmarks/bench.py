@@ -0,0 +1,397 @@
+import argparse
+import ast
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+# Benchmarks of the Python-side hot paths of the fleet services, run against
+# the in-memory fakecql stand-in (no Cassandra needed):
+#
+#   python benchmarks/bench.py                      # everything
+#   python benchmarks/bench.py -k dashboard         # names containing "dashboard"
+#   python benchmarks/bench.py --json out.json      # save best times
+#   python benchmarks/bench.py --compare base.json  # exit 1 on regressions
+#
+# Every benchmark is a setup function taking a size and returning the timed
+# callable; the best of --repeat runs is reported.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "fleet-etl"))
+sys.path.insert(0, os.path.join(ROOT, "fleet-dashboard"))
+
+import fakecql  # noqa: E402
+
+BENCHMARKS: list[tuple[str, list[int], object]] = []
+
+
+def benchmark(name: str, sizes: list[int]):
+    def register(setup):
+        BENCHMARKS.append((name, sizes, setup))
+        return setup
+
+    return register
+
+
+class Skip(Exception):
+    pass
+
+
+def _etl():
+    import etl
+
+    fakecql.patch(etl)
+    return etl
+
+
+def _dashboard():
+    # app.py renders its page at import time; outside `streamlit run` the
+    # widgets are inert, which is all the loaders need.
+    try:
+        import app
+    except ImportError as exc:
+        raise Skip(f"dashboard dependencies missing: {exc}") from None
+    fakecql.patch(app)
+    return app
+
+
+def _etl_events(etl, size: int, rng: np.random.Generator) -> list:
+    fleets = max(1, min(20, size // 500))
+    per_fleet = max(1, min(2000, size // fleets))
+    devices = etl._DeviceState({f"FLEET_{f}": [f"DEV-{f}-{d:05d}" for d in range(per_fleet)] for f in range(fleets)}, rng)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    idx = np.arange(len(devices))
+    events: list = []
+    step = 0
+    while len(events) < size:
+        ts = [start + timedelta(seconds=step * 5, microseconds=i) for i in range(len(idx))]
+        events.extend(etl._tick_events(devices, idx, rng, ts))
+        step += 1
+    return events[:size]
+
+
+@benchmark("etl.tick_events", [5_000, 50_000])
+def bench_tick_events(size: int):
+    etl = _etl()
+    rng = np.random.default_rng(1)
+    devices = etl._DeviceState({"FLEET_BENCH": [f"DEV-{i:06d}" for i in range(size)]}, rng)
+    idx = np.arange(size)
+    ts = [datetime(2026, 1, 1, tzinfo=timezone.utc)] * size
+
+    def run():
+        list(etl._tick_events(devices, idx, rng, ts))
+
+    return run
+
+
+@benchmark("etl.alert_rules", [5_000, 50_000])
+def bench_alert_rules(size: int):
+    etl = _etl()
+    events = _etl_events(etl, size, np.random.default_rng(2))
+    rules = etl._AlertRules.load(os.path.join(ROOT, "fleet-etl", "alert_rules.example.json"))
+
+    def run():
+        rules.evaluate(events)
+
+    return run
+
+
+@benchmark("etl.write_events", [5_000, 50_000])
+def bench_write_events(size: int):
+    # Full sink path (alerts, batching, latest cache, rollups, async writer)
+    # into the fake session: events/s = size / time.
+    etl = _etl()
+    events = _etl_events(etl, size, np.random.default_rng(3))
+    cluster = fakecql.Cluster(store=fakecql.Store(), discard_writes=True)
+    session = cluster.connect()
+    etl._ensure_tables(session)
+    stmts = etl._prepare_statements(session)
+    rules = etl._AlertRules.load("")
+
+    def run():
+        writer = etl._AsyncWriter(session, 128)
+        batcher = etl._PartitionBatcher(writer, 50, etl.BATCH_MAX_ROWS, etl.BATCH_MAX_BYTES)
+        sink = etl._EventSink(stmts, writer, batcher, rules)
+        for i in range(0, len(events), 1000):
+            sink.write(events[i : i + 1000])
+        sink.flush(final=True)
+
+    return run
+
+
+def _fleet_rows(size: int) -> tuple[list[str], list[list]]:
+    rng = np.random.default_rng(4)
+    start = datetime(2026, 1, 1)
+    columns = ["ts", "device_id", "lat", "lon", "speed_kmh", "battery_pct", "temp_c", "zone"]
+    devices = [f"DEV-{i:05d}" for i in range(2000)]
+    lat = (48.85 + rng.uniform(-0.05, 0.05, size)).tolist()
+    lon = (2.35 + rng.uniform(-0.05, 0.05, size)).tolist()
+    speed = np.maximum(0.0, rng.normal(35.0, 12.0, size)).tolist()
+    battery = rng.integers(0, 101, size).tolist()
+    temp = rng.normal(28.0, 4.0, size).tolist()
+    rows = [
+        [start - timedelta(milliseconds=i * 10), devices[i % len(devices)], lat[i], lon[i], speed[i], battery[i], temp[i], "IDF"]
+        for i in range(size)
+    ]
+    return columns, rows
+
+
+@benchmark("dashboard.rows_to_df", [5_000, 50_000, 500_000])
+def bench_rows_to_df(size: int):
+    # Driver-sized pages of tuples, as the dashboard session receives them.
+    app = _dashboard()
+    columns, rows = _fleet_rows(size)
+    session = fakecql.Cluster(store=fakecql.Store()).connect()
+    session.row_factory = app.tuple_factory
+    types = [fakecql.CqlType(t) for t in ("timestamp", "text", "double", "double", "double", "int", "double", "text")]
+
+    def run():
+        app._rows_to_df(fakecql.ResultSet(session, columns, rows, 5000, column_types=types))
+
+    return run
+
+
+@benchmark("dashboard.chart_prep", [5_000, 50_000, 500_000])
+def bench_chart_prep(size: int):
+    # Realtime tab: typed frame, speed distribution and last positions.
+    app = _dashboard()
+    columns, rows = _fleet_rows(size)
+    df = app.pd.DataFrame(rows, columns=columns)
+
+    def run():
+        df2 = app._realtime_frame(df)
+        app._speed_distribution(df2)
+        app._last_positions(df2)
+
+    return run
+
+
+@benchmark("dashboard.downsample", [50_000, 500_000])
+def bench_downsample(size: int):
+    # One Telemetry-tab series down to DASHBOARD_CHART_POINTS.
+    app = _dashboard()
+    index = app.pd.date_range("2026-01-01", periods=size, freq="s")
+    series = app.pd.Series(np.cumsum(np.random.default_rng(5).normal(size=size)), index=index)
+
+    def run():
+        app._downsample(series)
+
+    return run
+
+
+@benchmark("dashboard.cell_aggregation", [50_000, 500_000])
+def bench_cell_aggregation(size: int):
+    # Positions to geohash cells at the automatic precision.
+    app = _dashboard()
+    rng = np.random.default_rng(6)
+    df = app.pd.DataFrame(
+        {
+            "lat": 48.85 + rng.normal(0.0, 0.05, size),
+            "lon": 2.35 + rng.normal(0.0, 0.08, size),
+            "speed_kmh": rng.uniform(0.0, 100.0, size),
+            "temp_c": rng.normal(25.0, 3.0, size),
+        }
+    )
+
+    def run():
+        precision = app._auto_precision(df["lat"].to_numpy(), df["lon"].to_numpy())
+        app._cells_frame(app._cell_sums(df, precision), precision)
+
+    return run
+
+
+@benchmark("dashboard.load_realtime_fleet", [5_000, 50_000])
+def bench_load_realtime_fleet(size: int):
+    # size rows in today's partition; the loader reads the newest 5000.
+    app = _dashboard()
+    fakecql.DEFAULT_STORE.clear()
+    session = fakecql.Cluster().connect()
+    etl = _etl()
+    etl._ensure_tables(session)
+    bucketer = etl._fleet_bucketer(app.FLEET_BUCKETING, app.FLEET_BUCKETS)
+    if bucketer is None:
+        insert = session.prepare(
+            "INSERT INTO telemetry_by_fleet_day (fleet_id, day, ts, device_id, lat, lon, speed_kmh, battery_pct, temp_c, zone) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+    else:
+        insert = session.prepare(
+            "INSERT INTO telemetry_by_fleet_day_bucketed (fleet_id, day, bucket, ts, device_id, lat, lon, speed_kmh, battery_pct, temp_c, zone) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+    day = date.today()
+    midnight = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+    _, rows = _fleet_rows(size)
+    for i, (_, device_id, lat, lon, speed, battery, temp, zone) in enumerate(rows):
+        ts = midnight + timedelta(milliseconds=i)
+        key = ("FLEET_BENCH", day) if bucketer is None else ("FLEET_BENCH", day, bucketer(device_id, ts))
+        session.execute(insert, (*key, ts, device_id, lat, lon, speed, battery, temp, zone))
+
+    def run():
+        # __wrapped__ bypasses the process-wide result cache.
+        df, err = app.load_realtime_fleet.__wrapped__("FLEET_BENCH", day.isoformat(), 5000)
+        if err:
+            raise RuntimeError(err)
+
+    return run
+
+
+@benchmark("dashboard.load_fleet_snapshot", [500, 2_000])
+def bench_load_fleet_snapshot(size: int):
+    # size devices in devices_by_fleet, one latest_telemetry_by_device row each.
+    app = _dashboard()
+    fakecql.DEFAULT_STORE.clear()
+    session = fakecql.Cluster().connect()
+    _etl()._ensure_tables(session)
+    session.execute(
+        "CREATE TABLE IF NOT EXISTS devices_by_fleet (fleet_id text, device_id text, model text, activated_at timestamp, "
+        "PRIMARY KEY ((fleet_id), device_id))"
+    )
+    device = session.prepare("INSERT INTO devices_by_fleet (fleet_id, device_id, model, activated_at) VALUES (?, ?, ?, ?)")
+    latest = session.prepare(
+        "INSERT INTO latest_telemetry_by_device (device_id, last_ts, lat, lon, speed_kmh, battery_pct, temp_c) VALUES (?, ?, ?, ?, ?, ?, ?)"
+    )
+    now = datetime.now(timezone.utc)
+    for i in range(size):
+        session.execute(device, ("FLEET_BENCH", f"DEV-{i:05d}", "GPS", now))
+        session.execute(latest, (f"DEV-{i:05d}", now, 48.85, 2.35, 30.0, 80, 25.0))
+
+    def run():
+        # Cold path every time: the device list read is load_devices' cached
+        # result, which would otherwise outlive the previous size's store.
+        app._result_cache().clear()
+        df, err = app.load_fleet_snapshot.__wrapped__("FLEET_BENCH")
+        if err or len(df) != size:
+            raise RuntimeError(err or f"snapshot returned {len(df)} devices, expected {size}")
+
+    return run
+
+
+def _gui_cql_functions():
+    # main.py creates directories and a FastAPI app at import time; only the
+    # two pure parsing functions are needed here.
+    path = os.path.join(ROOT, "gui-cql", "main.py")
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    tree.body = [n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name in ("remove_comments", "split_queries")]
+    namespace: dict = {"List": list}
+    exec(compile(tree, path, "exec"), namespace)
+    return namespace["split_queries"]
+
+
+@benchmark("gui_cql.split_queries", [100, 1_000, 10_000])
+def bench_split_queries(size: int):
+    split_queries = _gui_cql_functions()
+    parts = ["-- generated script\n/* block\n comment */\nUSE atelier;\n"]
+    for i in range(size):
+        parts.append(
+            f"INSERT INTO devices_by_fleet (fleet_id, device_id, model, activated_at) "
+            f"VALUES ('FLEET_{i % 7}', 'DEV;{i}', 'GPS -- TX', '2026-01-01'); -- row {i}\n"
+        )
+    script = "".join(parts)
+
+    def run():
+        queries = split_queries(script)
+        if len(queries) != size + 1:
+            raise RuntimeError(f"split_queries returned {len(queries)} statements, expected {size + 1}")
+
+    return run
+
+
+@benchmark("gui_cql.execute", [1_000, 10_000])
+def bench_execute(size: int):
+    # /execute on a script of size INSERTs and one SELECT of size rows.
+    import asyncio
+    import tempfile
+
+    sys.path.insert(0, os.path.join(ROOT, "gui-cql"))
+    # main.py creates static/ and scripts/ under the working directory.
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="bench-gui-cql-"))
+    try:
+        import main
+    except ImportError as exc:
+        raise Skip(f"gui-cql dependencies missing: {exc}") from None
+    finally:
+        os.chdir(cwd)
+    main.session = fakecql.Cluster(store=fakecql.Store()).connect()
+    main.session.execute(
+        "CREATE TABLE devices_by_fleet (fleet_id text, device_id text, model text, activated_at timestamp, "
+        "PRIMARY KEY ((fleet_id), device_id))"
+    )
+    inserts = "".join(
+        f"INSERT INTO devices_by_fleet (fleet_id, device_id, model, activated_at) "
+        f"VALUES ('FLEET_BENCH', 'DEV-{i:06d}', 'GPS-TX', '2026-01-01');\n"
+        for i in range(size)
+    )
+    write = main.CqlRequest(query=inserts + "SELECT * FROM devices_by_fleet WHERE fleet_id = 'FLEET_BENCH';")
+
+    def run():
+        response = asyncio.run(main.execute_cql(write))
+        if response["failed"] or response["results"][-1]["row_count"] != size:
+            raise RuntimeError(f"/execute failed: {response['errors'][:1]}")
+
+    return run
+
+
+def _time(run, repeat: int) -> list[float]:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fleet services micro-benchmarks (in-memory Cassandra stand-in).")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-size", type=int, default=0, help="skip sizes above this")
+    parser.add_argument("--json", help="write {name[size]: best seconds} to this file")
+    parser.add_argument("--compare", help="baseline JSON from --json; exit 1 on regressions")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed slowdown vs the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results: dict[str, float] = {}
+    print(f"{'benchmark':<36} {'size':>8} {'best s':>10} {'median s':>10} {'items/s':>12}")
+    for name, sizes, setup in BENCHMARKS:
+        if args.filter not in name:
+            continue
+        for size in sizes:
+            if args.max_size and size > args.max_size:
+                continue
+            key = f"{name}[{size}]"
+            try:
+                run = setup(size)
+            except Skip as exc:
+                print(f"{key:<45} skipped: {exc}")
+                break
+            times = _time(run, max(1, args.repeat))
+            best = min(times)
+            results[key] = best
+            print(f"{name:<36} {size:>8} {best:>10.4f} {statistics.median(times):>10.4f} {size / best:>12.0f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = [
+            (key, baseline[key], best)
+            for key, best in results.items()
+            if key in baseline and best > baseline[key] * (1.0 + args.max_regression)
+        ]
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: {before:.4f}s -> {after:.4f}s ({after / before - 1.0:+.0%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,508 @@
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from cassandra.query import named_tuple_factory
+
+# In-memory stand-in for cassandra.cluster.Cluster / Session, enough for the
+# fleet services: CREATE TABLE / INSERT / SELECT on the CQL subset they use,
+# prepared statements, execute_async futures, driver-style paging and row
+# factories. Partitions keep their clustering order (ASC/DESC per column),
+# timestamps come back as naive UTC datetimes like the real driver, and
+# USING TIMESTAMP keeps the newest write. Keyspaces are ignored: tables are
+# looked up by their bare name.
+#
+# Services import Cluster / BatchStatement by name, so patch(module) swaps
+# them for the fakes; all fake clusters share DEFAULT_STORE unless given
+# their own. With discard_writes=True, INSERTs are parsed, bound and counted
+# but not stored, so write benchmarks measure the caller rather than the
+# fake's storage.
+
+
+class FakeError(Exception):
+    pass
+
+
+class _Desc:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _split_top(text: str) -> list[str]:
+    # Splits on commas outside (), <> and quotes.
+    parts, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch in "(<":
+            depth += 1
+        elif ch in ")>":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return [p for p in parts if p]
+
+
+def _bare(name: str) -> str:
+    return name.split(".")[-1].strip('"').lower()
+
+
+class _Table:
+    def __init__(self, name: str, columns: list[tuple[str, str]], partition: list[str], clustering: list[str], desc: set[str]):
+        self.name = name
+        self.columns = [c for c, _ in columns]
+        self.types = dict(columns)
+        self.partition = partition
+        self.clustering = clustering
+        self.desc = desc
+        self.partitions: dict[tuple, "_Partition"] = {}
+
+    def normalize(self, column: str, value):
+        if self.types.get(column) == "timestamp" and isinstance(value, datetime) and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def sort_key(self, ckey: tuple) -> tuple:
+        return tuple(_Desc(v) if c in self.desc else v for c, v in zip(self.clustering, ckey))
+
+
+class _Partition:
+    # Rows by clustering key; the order is rebuilt lazily on the first read
+    # after a write (Timsort is linear on the mostly-ordered keys writers
+    # produce).
+    __slots__ = ("rows", "order")
+
+    def __init__(self):
+        self.rows: dict[tuple, list] = {}
+        self.order: list[tuple] | None = []
+
+    def ordered(self, table: _Table) -> list[tuple]:
+        if self.order is None:
+            self.order = sorted(self.rows, key=table.sort_key)
+        return self.order
+
+
+class Store:
+    def __init__(self):
+        self.tables: dict[str, _Table] = {}
+        self.lock = threading.RLock()
+
+    def table(self, name: str) -> _Table:
+        try:
+            return self.tables[_bare(name)]
+        except KeyError:
+            raise FakeError(f"unconfigured table {_bare(name)}") from None
+
+    def clear(self) -> None:
+        with self.lock:
+            self.tables.clear()
+
+
+DEFAULT_STORE = Store()
+
+
+_CREATE_TABLE_RE = re.compile(
+    r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.\"]+)\s*\((.*?)\)\s*(?:WITH\s+(.*))?$", re.I | re.S
+)
+_INSERT_RE = re.compile(
+    r"^\s*INSERT\s+INTO\s+([\w.\"]+)\s*\(([^)]*)\)\s*VALUES\s*\((.*)\)\s*(?:USING\s+TIMESTAMP\s+(\S+))?\s*$", re.I | re.S
+)
+_SELECT_RE = re.compile(
+    r"^\s*SELECT\s+(.*?)\s+FROM\s+([\w.\"]+)(?:\s+WHERE\s+(.*?))?(?:\s+LIMIT\s+(\S+))?(?:\s+ALLOW\s+FILTERING)?\s*$",
+    re.I | re.S,
+)
+_COND_RE = re.compile(r"^\s*(\w+)\s*(=|>=|<=|>|<)\s*(.+?)\s*$", re.S)
+_PLACEHOLDERS = ("?", "%s")
+
+
+def _literal(token: str):
+    token = token.strip()
+    if token in _PLACEHOLDERS:
+        return _PLACEHOLDERS
+    if token.startswith("'") and token.endswith("'"):
+        return token[1:-1].replace("''", "'")
+    if token.lower() in ("true", "false"):
+        return token.lower() == "true"
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+
+
+class _Params:
+    def __init__(self, values):
+        self._values = list(values or ())
+        self._next = 0
+
+    def resolve(self, parsed):
+        if parsed is not _PLACEHOLDERS:
+            return parsed
+        value = self._values[self._next]
+        self._next += 1
+        return value
+
+
+class _Parsed:
+    __slots__ = ("kind", "table", "columns", "values", "timestamp", "conds", "limit")
+
+    def __init__(self, kind, table=None, columns=None, values=None, timestamp=None, conds=None, limit=None):
+        self.kind = kind
+        self.table = table
+        self.columns = columns
+        self.values = values
+        self.timestamp = timestamp
+        self.conds = conds
+        self.limit = limit
+
+
+def _parse(query: str) -> _Parsed:
+    text = query.strip().rstrip(";")
+    head = text[:16].upper()
+    if head.startswith("INSERT"):
+        m = _INSERT_RE.match(text)
+        if not m:
+            raise FakeError(f"unsupported INSERT: {query}")
+        columns = [c.strip().lower() for c in m.group(2).split(",")]
+        values = [_literal(v) for v in _split_top(m.group(3))]
+        timestamp = _literal(m.group(4)) if m.group(4) else None
+        return _Parsed("insert", _bare(m.group(1)), columns, values, timestamp)
+    if head.startswith("SELECT"):
+        m = _SELECT_RE.match(text)
+        if not m:
+            raise FakeError(f"unsupported SELECT: {query}")
+        columns = None if m.group(1).strip() == "*" else [c.strip().lower() for c in m.group(1).split(",")]
+        conds = []
+        if m.group(3):
+            for part in re.split(r"\s+AND\s+", m.group(3), flags=re.I):
+                c = _COND_RE.match(part)
+                if not c:
+                    raise FakeError(f"unsupported condition: {part}")
+                conds.append((c.group(1).lower(), c.group(2), _literal(c.group(3))))
+        limit = _literal(m.group(4)) if m.group(4) else None
+        return _Parsed("select", _bare(m.group(2)), columns, conds=conds, limit=limit)
+    if head.startswith("CREATE TABLE"):
+        return _Parsed("create_table", values=text)
+    if head.startswith("USE"):
+        return _Parsed("use", _bare(text.split()[1]))
+    if head.startswith("TRUNCATE"):
+        return _Parsed("truncate", _bare(text.split()[-1]))
+    if head.startswith(("CREATE KEYSPACE", "CREATE INDEX", "DROP")):
+        return _Parsed("noop")
+    raise FakeError(f"unsupported statement: {query}")
+
+
+def _create_table(store: Store, text: str) -> None:
+    m = _CREATE_TABLE_RE.match(text)
+    if not m:
+        raise FakeError(f"unsupported CREATE TABLE: {text}")
+    name = _bare(m.group(1))
+    columns, partition, clustering = [], [], []
+    for part in _split_top(m.group(2)):
+        if part.upper().startswith("PRIMARY KEY"):
+            key = part[part.index("(") + 1 : part.rindex(")")]
+            items = _split_top(key)
+            first = items[0]
+            partition = [c.strip().lower() for c in first.strip("()").split(",")] if first.startswith("(") else [first.lower()]
+            clustering = [c.lower() for c in items[1:]]
+            continue
+        tokens = part.split(None, 1)
+        col_type = tokens[1].strip()
+        if col_type.upper().endswith("PRIMARY KEY"):
+            col_type = col_type[: -len("PRIMARY KEY")].strip()
+            partition = [tokens[0].lower()]
+        columns.append((tokens[0].lower(), col_type.lower()))
+    desc = set()
+    if m.group(3):
+        order = re.search(r"CLUSTERING\s+ORDER\s+BY\s*\(([^)]*)\)", m.group(3), re.I)
+        if order:
+            for item in order.group(1).split(","):
+                col, _, direction = item.strip().partition(" ")
+                if direction.strip().upper() == "DESC":
+                    desc.add(col.lower())
+    with store.lock:
+        store.tables.setdefault(name, _Table(name, columns, partition, clustering, desc))
+
+
+_OPS = {
+    "=": lambda a, b: a == b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+class PreparedStatement:
+    def __init__(self, query_string: str, parsed: _Parsed):
+        self.query_string = query_string
+        self.parsed = parsed
+        self.is_idempotent = False
+        self.fetch_size = None
+
+    def bind(self, values):
+        return BoundStatement(self, values)
+
+
+class BoundStatement:
+    def __init__(self, prepared: PreparedStatement, values):
+        self.prepared_statement = prepared
+        self.values = tuple(values or ())
+        self.fetch_size = prepared.fetch_size
+
+
+class BatchStatement:
+    def __init__(self, batch_type=None, **kwargs):
+        self.batch_type = batch_type
+        self.entries: list[tuple] = []
+
+    def add(self, statement, parameters=None):
+        self.entries.append((statement, parameters))
+
+    def clear(self):
+        self.entries.clear()
+
+
+class CqlType:
+    # Stands in for the cassandra.cqltypes class in ResultSet.column_types;
+    # only typename ("timestamp", "float", "map", ...) is provided.
+    __slots__ = ("typename",)
+
+    def __init__(self, cql_type: str):
+        self.typename = cql_type.split("<")[0].strip().lower()
+
+
+class ResultSet:
+    # Driver-like result set: iterating walks every page (fetching the next
+    # ones on demand); current_rows / paging_state / fetch_next_page expose a
+    # single page.
+    def __init__(self, session, column_names, rows, fetch_size, offset=0, column_types=None):
+        self._session = session
+        self.column_names = column_names
+        self.column_types = column_types
+        self._all = rows
+        self._fetch_size = fetch_size
+        self._offset = offset
+        end = len(rows) if not fetch_size else min(len(rows), offset + fetch_size)
+        self._end = end
+        self.current_rows = session.row_factory(column_names, rows[offset:end]) if column_names else []
+
+    @property
+    def has_more_pages(self) -> bool:
+        return self._end < len(self._all)
+
+    @property
+    def paging_state(self):
+        return str(self._end).encode() if self.has_more_pages else None
+
+    def fetch_next_page(self) -> None:
+        nxt = ResultSet(self._session, self.column_names, self._all, self._fetch_size, self._end, self.column_types)
+        self.current_rows, self._offset, self._end = nxt.current_rows, nxt._offset, nxt._end
+
+    def __iter__(self):
+        page = self
+        while True:
+            yield from page.current_rows
+            if not page.has_more_pages:
+                return
+            page = ResultSet(self._session, self.column_names, self._all, self._fetch_size, page._end)
+
+    def one(self):
+        return self.current_rows[0] if self.current_rows else None
+
+    def all(self):
+        return list(self)
+
+    @property
+    def was_applied(self) -> bool:
+        return True
+
+
+class ResponseFuture:
+    # Requests run synchronously in execute_async(); callbacks fire as soon
+    # as they are added.
+    def __init__(self, result=None, error=None):
+        self._result = result
+        self._error = error
+
+    def result(self):
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def add_callback(self, fn, *args, **kwargs):
+        if self._error is None:
+            fn(self._result.current_rows if self._result is not None else [], *args, **kwargs)
+        return self
+
+    def add_errback(self, fn, *args, **kwargs):
+        if self._error is not None:
+            fn(self._error, *args, **kwargs)
+        return self
+
+    def add_callbacks(self, callback, errback, callback_args=(), callback_kwargs=None, errback_args=(), errback_kwargs=None):
+        self.add_callback(callback, *callback_args, **(callback_kwargs or {}))
+        self.add_errback(errback, *errback_args, **(errback_kwargs or {}))
+
+
+class Session:
+    def __init__(self, store: Store, keyspace: str | None = None, discard_writes: bool = False):
+        self._store = store
+        self._discard_writes = discard_writes
+        self.writes = 0
+        self._parsed: dict[str, _Parsed] = {}
+        self.keyspace = keyspace
+        self.row_factory = named_tuple_factory
+        self.default_fetch_size = 5000
+        self.default_timeout = 10.0
+        self.is_shutdown = False
+        self.requests = 0
+
+    def set_keyspace(self, keyspace: str) -> None:
+        self.keyspace = keyspace
+
+    def prepare(self, query: str) -> PreparedStatement:
+        return PreparedStatement(query, self._parse(query))
+
+    def execute(self, query, parameters=None, timeout=None, trace=False, custom_payload=None,
+                execution_profile=None, paging_state=None, host=None, execute_as=None):
+        self.requests += 1
+        if isinstance(query, BatchStatement):
+            for statement, params in query.entries:
+                self._run(statement, params, None)
+            return ResultSet(self, None, [], None)
+        return self._run(query, parameters, paging_state)
+
+    def execute_async(self, query, parameters=None, *args, **kwargs) -> ResponseFuture:
+        try:
+            return ResponseFuture(result=self.execute(query, parameters, *args, **kwargs))
+        except Exception as exc:
+            return ResponseFuture(error=exc)
+
+    def get_pool_state(self) -> dict:
+        return {}
+
+    def shutdown(self) -> None:
+        self.is_shutdown = True
+
+    def _parse(self, query: str) -> _Parsed:
+        parsed = self._parsed.get(query)
+        if parsed is None:
+            parsed = self._parsed[query] = _parse(query)
+        return parsed
+
+    def _run(self, statement, parameters, paging_state):
+        fetch_size = getattr(statement, "fetch_size", None)
+        if isinstance(statement, BoundStatement):
+            parsed, parameters = statement.prepared_statement.parsed, statement.values
+        elif isinstance(statement, PreparedStatement):
+            parsed = statement.parsed
+        elif isinstance(statement, str):
+            parsed = self._parse(statement)
+        else:
+            if type(statement).__name__ == "BatchStatement":
+                raise FakeError("driver BatchStatement cannot be replayed; patch the module with fakecql.patch()")
+            parsed = self._parse(statement.query_string)
+        if not isinstance(fetch_size, int):
+            fetch_size = self.default_fetch_size
+
+        params = _Params(parameters)
+        if parsed.kind == "insert":
+            self.writes += 1
+            if not self._discard_writes:
+                self._insert(parsed, params)
+        elif parsed.kind == "select":
+            offset = int(paging_state) if paging_state else 0
+            return self._select(parsed, params, fetch_size, offset)
+        elif parsed.kind == "create_table":
+            _create_table(self._store, parsed.values)
+        elif parsed.kind == "use":
+            self.keyspace = parsed.table
+        elif parsed.kind == "truncate":
+            with self._store.lock:
+                self._store.table(parsed.table).partitions.clear()
+        return ResultSet(self, None, [], None)
+
+    def _insert(self, parsed: _Parsed, params: _Params) -> None:
+        table = self._store.table(parsed.table)
+        row = {c: table.normalize(c, params.resolve(v)) for c, v in zip(parsed.columns, parsed.values)}
+        written = params.resolve(parsed.timestamp) if parsed.timestamp is not None else int(time.time() * 1_000_000)
+        pkey = tuple(row[c] for c in table.partition)
+        ckey = tuple(row[c] for c in table.clustering)
+        with self._store.lock:
+            partition = table.partitions.get(pkey)
+            if partition is None:
+                partition = table.partitions[pkey] = _Partition()
+            current = partition.rows.get(ckey)
+            if current is None:
+                values = [row.get(c) for c in table.columns]
+                partition.rows[ckey] = [written, values]
+                partition.order = None
+            elif written >= current[0]:
+                current[0] = written
+                values = current[1]
+                for i, c in enumerate(table.columns):
+                    if c in row:
+                        values[i] = row[c]
+
+    def _select(self, parsed: _Parsed, params: _Params, fetch_size: int, offset: int) -> ResultSet:
+        table = self._store.table(parsed.table)
+        conds = [(c, op, table.normalize(c, params.resolve(v))) for c, op, v in parsed.conds]
+        limit = params.resolve(parsed.limit) if parsed.limit is not None else None
+        names = parsed.columns or table.columns
+        positions = [table.columns.index(c) for c in names]
+        eq = {c: v for c, op, v in conds if op == "="}
+        rest = [(table.columns.index(c), _OPS[op], v) for c, op, v in conds if not (op == "=" and c in table.partition)]
+
+        with self._store.lock:
+            if all(c in eq for c in table.partition):
+                partition = table.partitions.get(tuple(eq[c] for c in table.partition))
+                partitions = [partition] if partition is not None else []
+            else:
+                partitions = list(table.partitions.values())
+            rows = []
+            for partition in partitions:
+                for ckey in partition.ordered(table):
+                    values = partition.rows[ckey][1]
+                    if all(op(values[i], v) for i, op, v in rest):
+                        rows.append([values[i] for i in positions])
+                        if limit is not None and len(rows) >= limit:
+                            break
+                if limit is not None and len(rows) >= limit:
+                    break
+        return ResultSet(self, names, rows, fetch_size, offset, [CqlType(table.types[c]) for c in names])
+
+
+class Cluster:
+    def __init__(self, contact_points=None, port=9042, store: Store | None = None, discard_writes: bool = False, **kwargs):
+        self.contact_points = contact_points
+        self.port = port
+        self._store = store or DEFAULT_STORE
+        self._discard_writes = discard_writes
+        self.is_shutdown = False
+
+    def connect(self, keyspace: str | None = None) -> Session:
+        return Session(self._store, keyspace, self._discard_writes)
+
+    def shutdown(self) -> None:
+        self.is_shutdown = True
+
+
+def patch(module) -> None:
+    # Points a service module's Cluster / BatchStatement names at the fakes.
+    for name, fake in (("Cluster", Cluster), ("BatchStatement", BatchStatement)):
+        if hasattr(module, name):
+            setattr(module, name, fake)
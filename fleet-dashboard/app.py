@@ -1,11 +1,21 @@
+import functools
+import heapq
+import itertools
 import os
 import re
-from datetime import date
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
 
+import numpy as np
 import pandas as pd
 import streamlit as st
+from cassandra import ConsistencyLevel
 from cassandra.auth import PlainTextAuthProvider
-from cassandra.cluster import Cluster
+from cassandra.cluster import EXEC_PROFILE_DEFAULT, Cluster, ExecutionProfile
+from cassandra.policies import ConstantSpeculativeExecutionPolicy, DCAwareRoundRobinPolicy, TokenAwarePolicy
+from cassandra.query import PreparedStatement, tuple_factory
 
 
 def _env_list(name: str, default: str) -> list[str]:
@@ -18,6 +28,53 @@ CASSANDRA_PORT = int(os.getenv("CASSANDRA_PORT", "9042"))
 CASSANDRA_USER = os.getenv("CASSANDRA_USER", "")
 CASSANDRA_PASSWORD = os.getenv("CASSANDRA_PASSWORD", "")
 CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "atelier")
+CASSANDRA_LOCAL_DC = os.getenv("CASSANDRA_LOCAL_DC", "dc1")
+CASSANDRA_REMOTE_HOSTS_PER_DC = int(os.getenv("CASSANDRA_REMOTE_HOSTS_PER_DC", "0"))
+CASSANDRA_CONSISTENCY = os.getenv("CASSANDRA_CONSISTENCY", "LOCAL_ONE").strip().upper()
+CASSANDRA_REQUEST_TIMEOUT_S = float(os.getenv("CASSANDRA_REQUEST_TIMEOUT_S", "10"))
+CASSANDRA_SPECULATIVE_DELAY_MS = int(os.getenv("CASSANDRA_SPECULATIVE_DELAY_MS", "50"))
+CASSANDRA_SPECULATIVE_ATTEMPTS = int(os.getenv("CASSANDRA_SPECULATIVE_ATTEMPTS", "2"))
+CASSANDRA_COMPRESSION = os.getenv("CASSANDRA_COMPRESSION", "lz4").strip().lower()
+CASSANDRA_EXECUTOR_THREADS = int(os.getenv("CASSANDRA_EXECUTOR_THREADS", "2"))
+# Must match the ETL's ETL_FLEET_BUCKETING / ETL_FLEET_BUCKETS.
+FLEET_BUCKETING = os.getenv("FLEET_BUCKETING", "none").strip().lower()
+FLEET_BUCKETS = int(os.getenv("FLEET_BUCKETS", "8"))
+# Paged whole-day reads: rows per driver page, and how much a single load may
+# hold before it stops and offers "Load more".
+DASHBOARD_FETCH_SIZE = int(os.getenv("DASHBOARD_FETCH_SIZE", "5000"))
+DASHBOARD_MEMORY_BUDGET_MB = float(os.getenv("DASHBOARD_MEMORY_BUDGET_MB", "256"))
+# In-flight limit for fan-out reads (one query per device or partition).
+DASHBOARD_FANOUT_CONCURRENCY = int(os.getenv("DASHBOARD_FANOUT_CONCURRENCY", "64"))
+# Date-range reads: widest range in days, and the cap on their global limit.
+DASHBOARD_MAX_RANGE_DAYS = int(os.getenv("DASHBOARD_MAX_RANGE_DAYS", "31"))
+DASHBOARD_RANGE_MAX_ROWS = int(os.getenv("DASHBOARD_RANGE_MAX_ROWS", "50000"))
+# Charts: points per line series after downsampling (lttb or minmax), and
+# the speed histogram's fixed bins (readings above the top edge land in the
+# last bin).
+DASHBOARD_CHART_POINTS = int(os.getenv("DASHBOARD_CHART_POINTS", "1000"))
+DASHBOARD_DOWNSAMPLE = os.getenv("DASHBOARD_DOWNSAMPLE", "lttb").strip().lower()
+DASHBOARD_SPEED_BIN_KMH = float(os.getenv("DASHBOARD_SPEED_BIN_KMH", "5"))
+DASHBOARD_SPEED_MAX_KMH = float(os.getenv("DASHBOARD_SPEED_MAX_KMH", "200"))
+# Maps: above DASHBOARD_MAP_MAX_POINTS positions, points are aggregated into
+# geohash cells, about DASHBOARD_MAP_CELLS of them across the data's extent.
+DASHBOARD_MAP_MAX_POINTS = int(os.getenv("DASHBOARD_MAP_MAX_POINTS", "2000"))
+DASHBOARD_MAP_CELLS = int(os.getenv("DASHBOARD_MAP_CELLS", "2000"))
+# Shared live view: one background poller per process keeps the newest
+# DASHBOARD_LIVE_ROWS telemetry rows and DASHBOARD_LIVE_ALERTS alerts of
+# today for every watched fleet, and forgets fleets nobody looked at for
+# DASHBOARD_LIVE_IDLE_S.
+DASHBOARD_LIVE_POLL_S = float(os.getenv("DASHBOARD_LIVE_POLL_S", "2"))
+DASHBOARD_LIVE_IDLE_S = float(os.getenv("DASHBOARD_LIVE_IDLE_S", "120"))
+DASHBOARD_LIVE_ROWS = int(os.getenv("DASHBOARD_LIVE_ROWS", "5000"))
+DASHBOARD_LIVE_ALERTS = int(os.getenv("DASHBOARD_LIVE_ALERTS", "500"))
+# Loader results shared by every viewer of this process: live reads expire
+# fast, today's day partitions a bit later, past days and device lists rarely
+# change. 0 disables caching for that kind of read.
+DASHBOARD_CACHE_MB = float(os.getenv("DASHBOARD_CACHE_MB", "128"))
+DASHBOARD_CACHE_TTL_LIVE_S = float(os.getenv("DASHBOARD_CACHE_TTL_LIVE_S", "2"))
+DASHBOARD_CACHE_TTL_DAY_S = float(os.getenv("DASHBOARD_CACHE_TTL_DAY_S", "10"))
+DASHBOARD_CACHE_TTL_PAST_S = float(os.getenv("DASHBOARD_CACHE_TTL_PAST_S", "3600"))
+DASHBOARD_CACHE_TTL_DEVICES_S = float(os.getenv("DASHBOARD_CACHE_TTL_DEVICES_S", "300"))
 
 
 _IDENT_RE = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
@@ -36,6 +93,46 @@ _cluster: Cluster | None = None
 _session = None
 
 
+def _execution_profile() -> ExecutionProfile:
+    # Dashboard reads: token-aware routing pinned to the local DC, LOCAL_ONE and
+    # speculative retries so that one slow replica does not stall a refresh.
+    speculative = None
+    if CASSANDRA_SPECULATIVE_ATTEMPTS > 0:
+        speculative = ConstantSpeculativeExecutionPolicy(
+            delay=CASSANDRA_SPECULATIVE_DELAY_MS / 1000.0,
+            max_attempts=CASSANDRA_SPECULATIVE_ATTEMPTS,
+        )
+    return ExecutionProfile(
+        load_balancing_policy=TokenAwarePolicy(
+            DCAwareRoundRobinPolicy(
+                local_dc=CASSANDRA_LOCAL_DC or None,
+                used_hosts_per_remote_dc=CASSANDRA_REMOTE_HOSTS_PER_DC,
+            )
+        ),
+        consistency_level=ConsistencyLevel.name_to_value[CASSANDRA_CONSISTENCY],
+        request_timeout=CASSANDRA_REQUEST_TIMEOUT_S,
+        speculative_execution_policy=speculative,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def _statement_cache() -> dict[str, PreparedStatement]:
+    return {}
+
+
+def _prepared(session, query: str) -> PreparedStatement:
+    # Each read is prepared once per session (token-aware routing, no
+    # re-parsing on the coordinator); _connect() empties the cache.
+    statements = _statement_cache()
+    statement = statements.get(query)
+    if statement is None:
+        statement = session.prepare(query)
+        # Speculative executions only apply to statements marked idempotent.
+        statement.is_idempotent = True
+        statements[query] = statement
+    return statement
+
+
 def _connect() -> None:
     global _cluster, _session
 
@@ -53,13 +150,21 @@ def _connect() -> None:
             pass
         _cluster = None
 
+    kwargs = {
+        "contact_points": CASSANDRA_CONTACT_POINTS,
+        "port": CASSANDRA_PORT,
+        "execution_profiles": {EXEC_PROFILE_DEFAULT: _execution_profile()},
+        "compression": CASSANDRA_COMPRESSION if CASSANDRA_COMPRESSION not in ("", "none") else False,
+        "executor_threads": CASSANDRA_EXECUTOR_THREADS,
+    }
     if CASSANDRA_USER and CASSANDRA_PASSWORD:
-        auth = PlainTextAuthProvider(username=CASSANDRA_USER, password=CASSANDRA_PASSWORD)
-        _cluster = Cluster(contact_points=CASSANDRA_CONTACT_POINTS, port=CASSANDRA_PORT, auth_provider=auth)
-    else:
-        _cluster = Cluster(contact_points=CASSANDRA_CONTACT_POINTS, port=CASSANDRA_PORT)
+        kwargs["auth_provider"] = PlainTextAuthProvider(username=CASSANDRA_USER, password=CASSANDRA_PASSWORD)
+    _cluster = Cluster(**kwargs)
 
+    _statement_cache().clear()
     _session = _cluster.connect()
+    # Rows come back as plain tuples; _rows_to_df turns pages into columns.
+    _session.row_factory = tuple_factory
     if CASSANDRA_KEYSPACE:
         _session.set_keyspace(CASSANDRA_KEYSPACE)
 
@@ -76,11 +181,317 @@ def _ensure_session_cached():
     return _ensure_session()
 
 
-def _rows_to_df(rows) -> pd.DataFrame:
-    rows = list(rows)
+# Column dtypes by CQL type; int columns holding nulls fall back to float64
+# and every other type stays object.
+_CQL_DTYPES = {
+    "timestamp": "datetime64[ns]",
+    "float": "float64",
+    "double": "float64",
+    "int": "int64",
+    "bigint": "int64",
+    "smallint": "int64",
+    "tinyint": "int64",
+    "counter": "int64",
+}
+
+
+def _column(values: tuple, dtype: str | None) -> np.ndarray:
+    if dtype is None:
+        return np.fromiter(values, dtype=object, count=len(values))
+    if dtype == "datetime64[ns]":
+        # pandas parses datetime objects far faster than np.array(dtype=...).
+        return pd.to_datetime(np.fromiter(values, dtype=object, count=len(values))).to_numpy(dtype=dtype)
+    if dtype == "int64":
+        try:
+            return np.array(values, dtype=dtype)
+        except TypeError:
+            return np.array(values, dtype="float64")
+    return np.array(values, dtype=dtype)
+
+
+def _column_dtypes(rs) -> list[str | None]:
+    types = getattr(rs, "column_types", None) or [None] * len(rs.column_names or [])
+    return [_CQL_DTYPES.get(getattr(t, "typename", None)) for t in types]
+
+
+def _tuple_columns(rows: list[tuple], dtypes: list[str | None]) -> list[np.ndarray] | None:
+    # None when there are no rows.
     if not rows:
+        return None
+    return [_column(values, dtype) for values, dtype in zip(zip(*rows), dtypes)]
+
+
+def _page_columns(rs, dtypes: list[str | None]) -> list[np.ndarray] | None:
+    # Current page only.
+    return _tuple_columns(rs.current_rows, dtypes)
+
+
+def _rows_to_df(rs) -> pd.DataFrame:
+    # Transposes each page of tuples straight into typed column arrays, so no
+    # per-row objects outlive the page they came in.
+    names = list(rs.column_names or [])
+    if not names:
+        return pd.DataFrame()
+    dtypes = _column_dtypes(rs)
+    chunks: list[list[np.ndarray]] = [[] for _ in names]
+    while True:
+        columns = _page_columns(rs, dtypes)
+        if columns is not None:
+            for chunk, column in zip(chunks, columns):
+                chunk.append(column)
+        if not rs.has_more_pages:
+            break
+        rs.fetch_next_page()
+    if not chunks[0]:
         return pd.DataFrame()
-    return pd.DataFrame([dict(r._asdict()) for r in rows])
+    return pd.DataFrame({name: chunk[0] if len(chunk) == 1 else np.concatenate(chunk) for name, chunk in zip(names, chunks)})
+
+
+def _fan_out(session, statement, params_list: list[tuple], concurrency: int, fetch_size: int | None = None) -> list:
+    # execute_concurrent-style: at most `concurrency` reads in flight, one
+    # result per params in order (the ResultSet, or the exception it raised).
+    slots = threading.BoundedSemaphore(max(1, concurrency))
+    futures = []
+    for params in params_list:
+        slots.acquire()
+        try:
+            if fetch_size is None:
+                future = session.execute_async(statement, params)
+            else:
+                bound = statement.bind(params)
+                bound.fetch_size = fetch_size
+                future = session.execute_async(bound)
+        except Exception:
+            slots.release()
+            raise
+        future.add_callbacks(lambda _rows: slots.release(), lambda _exc: slots.release())
+        futures.append(future)
+
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as exc:
+            results.append(exc)
+    return results
+
+
+def _rows_newest_first(rs):
+    # Rows of every page; the next page is only fetched once this one is used up.
+    while True:
+        yield from rs.current_rows
+        if not rs.has_more_pages:
+            return
+        rs.fetch_next_page()
+
+
+def _merge_newest(session, query: str, keys: list[tuple], limit: int) -> pd.DataFrame:
+    # Partitions that each come back newest first (ts DESC) are read
+    # concurrently (first page each, LIMIT bound to limit) and k-way merged
+    # into the newest `limit` rows overall. Later pages are only fetched when
+    # the merge reaches them, so the cost follows the rows returned rather
+    # than the number of partitions.
+    results = _fan_out(
+        session,
+        _prepared(session, query),
+        [(*key, limit) for key in keys],
+        DASHBOARD_FANOUT_CONCURRENCY,
+        fetch_size=max(1, min(limit, DASHBOARD_FETCH_SIZE)),
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    if not results or not results[0].column_names:
+        return pd.DataFrame()
+
+    names = list(results[0].column_names)
+    ts_index = names.index("ts")
+    merged = heapq.merge(*(_rows_newest_first(rs) for rs in results), key=lambda row: row[ts_index], reverse=True)
+    columns = _tuple_columns(list(itertools.islice(merged, limit)), _column_dtypes(results[0]))
+    return pd.DataFrame(dict(zip(names, columns))) if columns is not None else pd.DataFrame()
+
+
+def _day_range(start_str: str, end_str: str) -> list[date]:
+    # Newest day first.
+    start, end = _parse_iso_date(start_str), _parse_iso_date(end_str)
+    if end < start:
+        raise ValueError("end day is before start day")
+    days = (end - start).days + 1
+    if days > DASHBOARD_MAX_RANGE_DAYS:
+        raise ValueError(f"range spans {days} days, at most {DASHBOARD_MAX_RANGE_DAYS} allowed")
+    return [date.fromordinal(end.toordinal() - i) for i in range(days)]
+
+
+def _range_limit(limit: int) -> int:
+    return min(max(int(limit), 1), DASHBOARD_RANGE_MAX_ROWS)
+
+
+def _stream_day(session, query: str, keys: list[tuple], cursor=None):
+    # Streams a day partition by partition (keys in read order), one frame
+    # per driver page. Every page comes with the cursor to resume after it:
+    # (partition index, driver paging state), or None once the day is done.
+    index, paging_state = cursor or (0, None)
+    prepared = _prepared(session, query)
+    while index < len(keys):
+        statement = prepared.bind(keys[index])
+        statement.fetch_size = max(1, DASHBOARD_FETCH_SIZE)
+        rs = session.execute(statement, paging_state=paging_state)
+        names = list(rs.column_names or [])
+        dtypes = _column_dtypes(rs)
+        while True:
+            columns = _page_columns(rs, dtypes)
+            page = pd.DataFrame(dict(zip(names, columns))) if columns is not None else pd.DataFrame()
+            paging_state = rs.paging_state
+            if paging_state is None:
+                index += 1
+            yield page, ((index, paging_state) if index < len(keys) else None)
+            if paging_state is None:
+                break
+            rs.fetch_next_page()
+
+
+def _collect_pages(pages, budget_bytes: int, on_page=None):
+    # Accumulates streamed pages until the day ends or budget_bytes are held;
+    # returns the frames and the cursor to continue from (None at the end).
+    frames: list[pd.DataFrame] = []
+    used, cursor = 0, None
+    for page, cursor in pages:
+        if not page.empty:
+            frames.append(page)
+            used += int(page.memory_usage(deep=True).sum())
+            if on_page is not None:
+                on_page(frames, used)
+        if used >= budget_bytes:
+            break
+    return frames, cursor
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class _ResultCache:
+    # Process-wide (df, err) loader results: per-entry TTL, LRU eviction once
+    # the frames exceed max_bytes, and single-flight so concurrent identical
+    # misses share one query. Errors are handed to waiting callers but never
+    # stored. Cached frames are shared between sessions: treat as read-only.
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple[float, int, tuple]] = OrderedDict()
+        self._inflight: dict[tuple, _Flight] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def get_or_load(self, key: tuple, ttl_s: float, load):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = load()
+            if ttl_s > 0 and not flight.result[1]:
+                self._put(key, ttl_s, flight.result)
+            return flight.result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def _put(self, key: tuple, ttl_s: float, result: tuple) -> None:
+        size = int(result[0].memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic() + ttl_s, size, result)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "mb": round(self._bytes / 1e6, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def _result_cache() -> _ResultCache:
+    # st.cache_resource keeps one instance across reruns and sessions.
+    return _ResultCache(int(DASHBOARD_CACHE_MB * 1e6))
+
+
+def _day_ttl(live_s: float, position: int = 1):
+    # TTL by the (last) day argument at `position`: live_s for today or later,
+    # DASHBOARD_CACHE_TTL_PAST_S for days that can no longer change.
+    def ttl(*args) -> float:
+        try:
+            day_value = _parse_iso_date(args[position])
+        except ValueError:
+            return 0.0
+        return live_s if day_value >= datetime.now(timezone.utc).date() else DASHBOARD_CACHE_TTL_PAST_S
+
+    return ttl
+
+
+def _cached(ttl):
+    # Caches a loader process-wide, keyed by its name and normalized args;
+    # ttl is seconds or a function of the loader's args.
+    def wrap(loader):
+        @functools.wraps(loader)
+        def cached(*args, **kwargs):
+            key = (
+                loader.__name__,
+                *(a.strip() if isinstance(a, str) else a for a in args),
+                *sorted(kwargs.items()),
+            )
+            ttl_s = ttl(*args) if callable(ttl) else ttl
+            if ttl_s <= 0:
+                return loader(*args, **kwargs)
+            return _result_cache().get_or_load(key, ttl_s, lambda: loader(*args, **kwargs))
+
+        return cached
+
+    return wrap
 
 
 def _parse_iso_date(value: str) -> date:
@@ -90,6 +501,7 @@ def _parse_iso_date(value: str) -> date:
         raise ValueError("Invalid date format. Expected YYYY-MM-DD") from exc
 
 
+@_cached(DASHBOARD_CACHE_TTL_DEVICES_S)
 def load_devices(fleet_id: str):
     try:
         session = _ensure_session_cached()
@@ -97,7 +509,7 @@ def load_devices(fleet_id: str):
             return pd.DataFrame(), "fleet_id is required"
 
         rs = session.execute(
-            f"SELECT device_id, model, activated_at FROM {_qualify_table('devices_by_fleet')} WHERE fleet_id=%s",
+            _prepared(session, f"SELECT device_id, model, activated_at FROM {_qualify_table('devices_by_fleet')} WHERE fleet_id=?"),
             (fleet_id.strip(),),
         )
         df = _rows_to_df(rs)
@@ -106,7 +518,8 @@ def load_devices(fleet_id: str):
         return pd.DataFrame(), str(exc)
 
 
-def load_realtime_fleet(fleet_id: str, day_str: str, limit: int):
+@_cached(_day_ttl(DASHBOARD_CACHE_TTL_LIVE_S))
+def load_realtime_fleet(fleet_id: str, day_str: str, limit: int, since: datetime | None = None):
     try:
         session = _ensure_session_cached()
         if not fleet_id.strip():
@@ -121,16 +534,171 @@ def load_realtime_fleet(fleet_id: str, day_str: str, limit: int):
         if limit_value > 5000:
             limit_value = 5000
 
-        rs = session.execute(
-            f"SELECT ts, device_id, lat, lon, speed_kmh, battery_pct, temp_c, zone FROM {_qualify_table('telemetry_by_fleet_day')} WHERE fleet_id=%s AND day=%s LIMIT {limit_value}",
-            (fleet_id.strip(), day_value),
-        )
-        df = _rows_to_df(rs)
+        # since: only rows at or after that ts (delta refresh), a cheap slice of
+        # the ts DESC clustering.
+        ts_filter, ts_params = ("", ()) if since is None else (" AND ts>=?", (since,))
+
+        if FLEET_BUCKETING == "none":
+            rs = session.execute(
+                _prepared(session, f"SELECT ts, device_id, lat, lon, speed_kmh, battery_pct, temp_c, zone FROM {_qualify_table('telemetry_by_fleet_day')} WHERE fleet_id=? AND day=?{ts_filter} LIMIT ?"),
+                (fleet_id.strip(), day_value, *ts_params, limit_value),
+            )
+            return _rows_to_df(rs), ""
+
+        # Each bucket holds its own newest rows first: read the newest limit rows
+        # of every bucket in parallel and keep the overall newest limit.
+        buckets = _fleet_buckets(day_value)
+        if since is not None and FLEET_BUCKETING == "hour" and since.date() == day_value:
+            buckets = [b for b in buckets if b >= since.hour]
+        query = _prepared(session, f"SELECT ts, device_id, lat, lon, speed_kmh, battery_pct, temp_c, zone FROM {_qualify_table('telemetry_by_fleet_day_bucketed')} WHERE fleet_id=? AND day=? AND bucket=?{ts_filter} LIMIT ?")
+        futures = [session.execute_async(query, (fleet_id.strip(), day_value, b, *ts_params, limit_value)) for b in buckets]
+        frames = [df for df in (_rows_to_df(f.result()) for f in futures) if not df.empty]
+        if not frames:
+            return pd.DataFrame(), ""
+        df = pd.concat(frames, ignore_index=True).sort_values("ts", ascending=False, kind="stable")
+        return df.head(limit_value).reset_index(drop=True), ""
+    except Exception as exc:
+        return pd.DataFrame(), str(exc)
+
+
+def _fleet_buckets(day_value: date) -> list[int]:
+    if FLEET_BUCKETING == "hour":
+        now = datetime.now(timezone.utc)
+        last = now.hour if day_value == now.date() else 23
+        return list(range(last, -1, -1))
+    if FLEET_BUCKETING == "hash":
+        return list(range(max(1, FLEET_BUCKETS)))
+    raise ValueError(f"FLEET_BUCKETING must be none, hour or hash, got {FLEET_BUCKETING!r}")
+
+
+def stream_fleet_day(fleet_id: str, day_str: str, cursor=None):
+    session = _ensure_session_cached()
+    if not fleet_id.strip():
+        raise ValueError("fleet_id is required")
+    if not day_str.strip():
+        raise ValueError("day is required")
+
+    day_value = _parse_iso_date(day_str)
+    columns = "ts, device_id, lat, lon, speed_kmh, battery_pct, temp_c, zone"
+    if FLEET_BUCKETING == "none":
+        query = f"SELECT {columns} FROM {_qualify_table('telemetry_by_fleet_day')} WHERE fleet_id=? AND day=?"
+        keys = [(fleet_id.strip(), day_value)]
+    else:
+        # Hour buckets stream newest first; hash buckets one after the other.
+        query = f"SELECT {columns} FROM {_qualify_table('telemetry_by_fleet_day_bucketed')} WHERE fleet_id=? AND day=? AND bucket=?"
+        keys = [(fleet_id.strip(), day_value, b) for b in _fleet_buckets(day_value)]
+    return _stream_day(session, query, keys, cursor)
+
+
+def stream_device_day(device_id: str, day_str: str, cursor=None):
+    session = _ensure_session_cached()
+    if not device_id.strip():
+        raise ValueError("device_id is required")
+    if not day_str.strip():
+        raise ValueError("day is required")
+
+    day_value = _parse_iso_date(day_str)
+    query = f"SELECT ts, lat, lon, speed_kmh, battery_pct, temp_c, zone FROM {_qualify_table('telemetry_by_device_day')} WHERE device_id=? AND day=?"
+    return _stream_day(session, query, [(device_id.strip(), day_value)], cursor)
+
+
+@_cached(_day_ttl(DASHBOARD_CACHE_TTL_LIVE_S, position=2))
+def load_realtime_fleet_range(fleet_id: str, start_str: str, end_str: str, limit: int):
+    try:
+        session = _ensure_session_cached()
+        if not fleet_id.strip():
+            return pd.DataFrame(), "fleet_id is required"
+
+        days = _day_range(start_str, end_str)
+        columns = "ts, device_id, lat, lon, speed_kmh, battery_pct, temp_c, zone"
+        if FLEET_BUCKETING == "none":
+            query = f"SELECT {columns} FROM {_qualify_table('telemetry_by_fleet_day')} WHERE fleet_id=? AND day=? LIMIT ?"
+            keys = [(fleet_id.strip(), d) for d in days]
+        else:
+            query = f"SELECT {columns} FROM {_qualify_table('telemetry_by_fleet_day_bucketed')} WHERE fleet_id=? AND day=? AND bucket=? LIMIT ?"
+            keys = [(fleet_id.strip(), d, b) for d in days for b in _fleet_buckets(d)]
+        return _merge_newest(session, query, keys, _range_limit(limit)), ""
+    except Exception as exc:
+        return pd.DataFrame(), str(exc)
+
+
+@_cached(_day_ttl(DASHBOARD_CACHE_TTL_DAY_S, position=2))
+def load_alerts_range(fleet_id: str, start_str: str, end_str: str, severities: tuple, limit: int):
+    try:
+        session = _ensure_session_cached()
+        if not fleet_id.strip():
+            return pd.DataFrame(), "fleet_id is required"
+        if not severities:
+            return pd.DataFrame(), "at least one severity is required"
+
+        query = f"SELECT ts, severity, device_id, alert_type, message FROM {_qualify_table('alerts_by_fleet_day')} WHERE fleet_id=? AND day=? AND severity=? LIMIT ?"
+        keys = [(fleet_id.strip(), d, sev) for d in _day_range(start_str, end_str) for sev in severities]
+        return _merge_newest(session, query, keys, _range_limit(limit)), ""
+    except Exception as exc:
+        return pd.DataFrame(), str(exc)
+
+
+@_cached(_day_ttl(DASHBOARD_CACHE_TTL_DAY_S, position=2))
+def load_telemetry_range(device_id: str, start_str: str, end_str: str, limit: int):
+    try:
+        session = _ensure_session_cached()
+        if not device_id.strip():
+            return pd.DataFrame(), "device_id is required"
+
+        query = f"SELECT ts, lat, lon, speed_kmh, battery_pct, temp_c, zone FROM {_qualify_table('telemetry_by_device_day')} WHERE device_id=? AND day=? LIMIT ?"
+        keys = [(device_id.strip(), d) for d in _day_range(start_str, end_str)]
+        return _merge_newest(session, query, keys, _range_limit(limit)), ""
+    except Exception as exc:
+        return pd.DataFrame(), str(exc)
+
+
+@_cached(_day_ttl(DASHBOARD_CACHE_TTL_DAY_S))
+def load_fleet_day_cells(fleet_id: str, day_str: str, precision: int):
+    # Where the fleet spent the day: the whole fleet-day streamed page by
+    # page into per-cell sums, so no raw rows are kept.
+    try:
+        partials = []
+        for page, _ in stream_fleet_day(fleet_id, day_str):
+            if not page.empty:
+                partials.append(_cell_sums(page, int(precision)))
+        if not partials:
+            return pd.DataFrame(), ""
+        sums = pd.concat(partials).groupby(level="cell").sum()
+        return _cells_frame(sums, int(precision)), ""
+    except Exception as exc:
+        return pd.DataFrame(), str(exc)
+
+
+@_cached(DASHBOARD_CACHE_TTL_LIVE_S)
+def load_fleet_snapshot(fleet_id: str):
+    # One latest_telemetry_by_device row per device of devices_by_fleet, read
+    # concurrently: every device shows up, however long ago it reported.
+    # df.attrs["failed"] counts device reads that errored.
+    try:
+        session = _ensure_session_cached()
+        devices, err = load_devices(fleet_id)
+        if err:
+            return pd.DataFrame(), err
+        if devices.empty:
+            return pd.DataFrame(), ""
+
+        statement = _prepared(session, f"SELECT device_id, last_ts, lat, lon, speed_kmh, battery_pct, temp_c FROM {_qualify_table('latest_telemetry_by_device')} WHERE device_id=?")
+        params = [(d,) for d in devices["device_id"].dropna().astype(str)]
+        results = _fan_out(session, statement, params, DASHBOARD_FANOUT_CONCURRENCY)
+        ok = [r for r in results if not isinstance(r, Exception)]
+        failed = len(results) - len(ok)
+        if not ok:
+            return pd.DataFrame(), f"all {failed} device reads failed: {results[0]}"
+
+        columns = _tuple_columns([row for rs in ok for row in rs.current_rows], _column_dtypes(ok[0]))
+        df = pd.DataFrame(dict(zip(ok[0].column_names, columns))) if columns is not None else pd.DataFrame()
+        df.attrs["failed"] = failed
         return df, ""
     except Exception as exc:
         return pd.DataFrame(), str(exc)
 
 
+@_cached(DASHBOARD_CACHE_TTL_LIVE_S)
 def load_latest(device_id: str):
     try:
         session = _ensure_session_cached()
@@ -138,7 +706,7 @@ def load_latest(device_id: str):
             return pd.DataFrame(), "device_id is required"
 
         rs = session.execute(
-            f"SELECT device_id, last_ts, lat, lon, speed_kmh, battery_pct, temp_c FROM {_qualify_table('latest_telemetry_by_device')} WHERE device_id=%s",
+            _prepared(session, f"SELECT device_id, last_ts, lat, lon, speed_kmh, battery_pct, temp_c FROM {_qualify_table('latest_telemetry_by_device')} WHERE device_id=?"),
             (device_id.strip(),),
         )
         df = _rows_to_df(rs)
@@ -147,6 +715,7 @@ def load_latest(device_id: str):
         return pd.DataFrame(), str(exc)
 
 
+@_cached(_day_ttl(DASHBOARD_CACHE_TTL_DAY_S))
 def load_alerts(fleet_id: str, day_str: str, severity: str):
     try:
         session = _ensure_session_cached()
@@ -159,8 +728,8 @@ def load_alerts(fleet_id: str, day_str: str, severity: str):
         day_value = _parse_iso_date(day_str)
 
         rs = session.execute(
-            f"SELECT ts, device_id, alert_type, message FROM {_qualify_table('alerts_by_fleet_day')} WHERE fleet_id=%s AND day=%s AND severity=%s LIMIT 200",
-            (fleet_id.strip(), day_value, severity),
+            _prepared(session, f"SELECT ts, device_id, alert_type, message FROM {_qualify_table('alerts_by_fleet_day')} WHERE fleet_id=? AND day=? AND severity=? LIMIT ?"),
+            (fleet_id.strip(), day_value, severity, 200),
         )
         df = _rows_to_df(rs)
         return df, ""
@@ -168,6 +737,7 @@ def load_alerts(fleet_id: str, day_str: str, severity: str):
         return pd.DataFrame(), str(exc)
 
 
+@_cached(_day_ttl(DASHBOARD_CACHE_TTL_DAY_S))
 def load_telemetry(device_id: str, day_str: str, limit: int):
     try:
         session = _ensure_session_cached()
@@ -184,8 +754,8 @@ def load_telemetry(device_id: str, day_str: str, limit: int):
             limit_value = 500
 
         rs = session.execute(
-            f"SELECT ts, lat, lon, speed_kmh, battery_pct, temp_c, zone FROM {_qualify_table('telemetry_by_device_day')} WHERE device_id=%s AND day=%s LIMIT {limit_value}",
-            (device_id.strip(), day_value),
+            _prepared(session, f"SELECT ts, lat, lon, speed_kmh, battery_pct, temp_c, zone FROM {_qualify_table('telemetry_by_device_day')} WHERE device_id=? AND day=? LIMIT ?"),
+            (device_id.strip(), day_value, limit_value),
         )
         df = _rows_to_df(rs)
         return df, ""
@@ -193,6 +763,507 @@ def load_telemetry(device_id: str, day_str: str, limit: int):
         return pd.DataFrame(), str(exc)
 
 
+@_cached(_day_ttl(DASHBOARD_CACHE_TTL_DAY_S))
+def load_fleet_rollups(fleet_id: str, day_str: str):
+    try:
+        session = _ensure_session_cached()
+        if not fleet_id.strip():
+            return pd.DataFrame(), "fleet_id is required"
+        if not day_str.strip():
+            return pd.DataFrame(), "day is required"
+
+        day_value = _parse_iso_date(day_str)
+
+        rs = session.execute(
+            _prepared(session, f"SELECT minute, source, event_count, speed_sum, speed_max, battery_min, temp_max, active_devices, speed_hist FROM {_qualify_table('telemetry_rollup_by_fleet_day')} WHERE fleet_id=? AND day=?"),
+            (fleet_id.strip(), day_value),
+        )
+        df = _rows_to_df(rs)
+        if df.empty:
+            return df, ""
+        return _merge_rollup_sources(df), ""
+    except Exception as exc:
+        return pd.DataFrame(), str(exc)
+
+
+def _merge_rollup_sources(df: pd.DataFrame) -> pd.DataFrame:
+    # One partial row per ETL worker run (source) and minute: sums add up,
+    # extrema combine, and devices are sharded disjointly so active_devices
+    # sums too (a device can count twice in the minute a worker restarted).
+    df = df.copy()
+    df["minute"] = pd.to_datetime(df["minute"], errors="coerce")
+    merged = df.groupby("minute").agg(
+        event_count=("event_count", "sum"),
+        speed_sum=("speed_sum", "sum"),
+        speed_max=("speed_max", "max"),
+        battery_min=("battery_min", "min"),
+        temp_max=("temp_max", "max"),
+        active_devices=("active_devices", "sum"),
+    )
+    merged["speed_mean"] = merged["speed_sum"] / merged["event_count"].where(merged["event_count"] > 0)
+
+    hist: dict[int, int] = {}
+    for buckets in df["speed_hist"].dropna():
+        for bucket, count in dict(buckets).items():
+            hist[int(bucket)] = hist.get(int(bucket), 0) + int(count)
+    merged.attrs["speed_hist"] = pd.Series(hist, dtype="int64").sort_index()
+    return merged.drop(columns=["speed_sum"]).sort_index()
+
+
+def _realtime_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df2 = df.copy()
+    if "ts" in df2.columns:
+        df2["ts"] = pd.to_datetime(df2["ts"], errors="coerce")
+    for col in ["speed_kmh", "battery_pct", "temp_c", "lat", "lon"]:
+        if col in df2.columns:
+            df2[col] = pd.to_numeric(df2[col], errors="coerce")
+    return df2
+
+
+_SPEED_EDGES = np.arange(0.0, DASHBOARD_SPEED_MAX_KMH + DASHBOARD_SPEED_BIN_KMH, DASHBOARD_SPEED_BIN_KMH)
+
+
+def _speed_distribution(df2: pd.DataFrame) -> pd.Series:
+    # Counts per fixed bin, indexed by the bin's lower edge; every bin is
+    # present so windows can add and subtract distributions.
+    speeds = df2["speed_kmh"].to_numpy(dtype="float64", na_value=np.nan) if len(df2) else np.empty(0)
+    speeds = np.clip(speeds[~np.isnan(speeds)], _SPEED_EDGES[0], _SPEED_EDGES[-1])
+    counts, _ = np.histogram(speeds, bins=_SPEED_EDGES)
+    return pd.Series(counts, index=_SPEED_EDGES[:-1], name="rows")
+
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: first and last points, then per bucket
+    # the point making the largest triangle with the previous pick and the
+    # next bucket's mean. One NumPy pass per bucket.
+    n = len(x)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    picked = np.empty(points, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        mean_x, mean_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - mean_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y - y[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def _minmax_indices(y: np.ndarray, points: int) -> np.ndarray:
+    # The min and max of each of points/2 equal buckets, plus both ends, so
+    # spikes survive.
+    n = len(y)
+    buckets = max(1, points // 2 - 1)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    segment = np.repeat(np.arange(buckets), np.diff(edges))
+    order = np.lexsort((y, segment))
+    return np.unique(np.concatenate(([0, n - 1], order[edges[:-1]], order[edges[1:] - 1])))
+
+
+def _downsample(series: pd.Series, points: int = DASHBOARD_CHART_POINTS) -> pd.Series:
+    # series must be sorted by its (time) index; returns at most ~points rows.
+    series = series.dropna()
+    if points < 4 or len(series) <= points:
+        return series
+    y = series.to_numpy(dtype="float64")
+    if DASHBOARD_DOWNSAMPLE == "minmax":
+        return series.iloc[_minmax_indices(y, points)]
+    index = series.index
+    x = index.asi8.astype("float64") if isinstance(index, pd.DatetimeIndex) else np.arange(len(y), dtype="float64")
+    return series.iloc[_lttb_indices(x, y, points)]
+
+
+_GEOHASH_BASE32 = np.array(list("0123456789bcdefghjkmnpqrstuvwxyz"))
+
+
+def _geohash_bits(precision: int) -> tuple[int, int]:
+    # (lat bits, lon bits): geohash interleaves 5 bits per character, lon first.
+    return 5 * precision // 2, (5 * precision + 1) // 2
+
+
+def _cell_ids(lat: np.ndarray, lon: np.ndarray, precision: int) -> np.ndarray:
+    # Integer id of the geohash cell of each point: lat index << lon bits | lon index.
+    lat_bits, lon_bits = _geohash_bits(precision)
+    lat_idx = np.clip(((lat + 90.0) / 180.0 * (1 << lat_bits)).astype(np.int64), 0, (1 << lat_bits) - 1)
+    lon_idx = np.clip(((lon + 180.0) / 360.0 * (1 << lon_bits)).astype(np.int64), 0, (1 << lon_bits) - 1)
+    return (lat_idx << lon_bits) | lon_idx
+
+
+def _cell_sums(df: pd.DataFrame, precision: int) -> pd.DataFrame:
+    # Per-cell count and speed/temp sums (sums rather than means, so pages and
+    # windows can be combined by adding them up).
+    lat = df["lat"].to_numpy(dtype="float64", na_value=np.nan)
+    lon = df["lon"].to_numpy(dtype="float64", na_value=np.nan)
+    keep = ~(np.isnan(lat) | np.isnan(lon))
+    if not keep.any():
+        return pd.DataFrame(columns=["count", "speed_sum", "speed_n", "temp_sum", "temp_n"], dtype="float64")
+    cells, inverse = np.unique(_cell_ids(lat[keep], lon[keep], precision), return_inverse=True)
+    sums = {"count": np.bincount(inverse, minlength=len(cells)).astype("float64")}
+    for col, name in (("speed_kmh", "speed"), ("temp_c", "temp")):
+        values = df[col].to_numpy(dtype="float64", na_value=np.nan)[keep] if col in df.columns else np.full(len(inverse), np.nan)
+        present = ~np.isnan(values)
+        sums[f"{name}_sum"] = np.bincount(inverse[present], weights=values[present], minlength=len(cells))
+        sums[f"{name}_n"] = np.bincount(inverse[present], minlength=len(cells)).astype("float64")
+    return pd.DataFrame(sums, index=pd.Index(cells, name="cell"))
+
+
+def _cells_frame(sums: pd.DataFrame, precision: int) -> pd.DataFrame:
+    # Cell centers, geohash names and means, plus size (m) and color (mean
+    # speed, green to red at 90 km/h) columns for st.map.
+    lat_bits, lon_bits = _geohash_bits(precision)
+    cells = sums.index.to_numpy(dtype=np.int64)
+    lat_idx, lon_idx = cells >> lon_bits, cells & ((1 << lon_bits) - 1)
+    cell_lat, cell_lon = 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+    code = np.zeros(len(cells), dtype=np.int64)
+    for i in range(5 * precision):
+        idx, bits, pos = (lon_idx, lon_bits, i // 2) if i % 2 == 0 else (lat_idx, lat_bits, i // 2)
+        code = (code << 1) | ((idx >> (bits - 1 - pos)) & 1)
+    chars = np.stack([_GEOHASH_BASE32[(code >> (5 * (precision - 1 - k))) & 31] for k in range(precision)], axis=1)
+
+    speed_mean = (sums["speed_sum"] / sums["speed_n"].where(sums["speed_n"] > 0)).to_numpy()
+    red = np.clip(np.nan_to_num(speed_mean, nan=0.0) / 90.0, 0.0, 1.0)
+    counts = sums["count"].to_numpy()
+    return pd.DataFrame(
+        {
+            "geohash": ["".join(c) for c in chars],
+            "lat": -90.0 + (lat_idx + 0.5) * cell_lat,
+            "lon": -180.0 + (lon_idx + 0.5) * cell_lon,
+            "count": counts.astype("int64"),
+            "speed_mean": speed_mean,
+            "temp_mean": (sums["temp_sum"] / sums["temp_n"].where(sums["temp_n"] > 0)).to_numpy(),
+            "size": cell_lat * 111_320.0 / 2.0 * np.sqrt(counts / counts.max()).clip(0.2, 1.0),
+            "color": [f"#{int(255 * r):02x}{int(255 * (1 - r)):02x}40c0" for r in red],
+        }
+    )
+
+
+def _auto_precision(lat: np.ndarray, lon: np.ndarray, target_cells: int = DASHBOARD_MAP_CELLS) -> int:
+    # Finest precision whose cells, spread over the points' extent, stay
+    # within target_cells: the "zoom level" of the data on screen.
+    lat_span = max(float(np.nanmax(lat) - np.nanmin(lat)), 1e-6)
+    lon_span = max(float(np.nanmax(lon) - np.nanmin(lon)), 1e-6)
+    for precision in range(9, 0, -1):
+        lat_bits, lon_bits = _geohash_bits(precision)
+        if (lat_span / (180.0 / (1 << lat_bits))) * (lon_span / (360.0 / (1 << lon_bits))) <= target_cells:
+            return precision
+    return 1
+
+
+def _render_positions(df: pd.DataFrame) -> None:
+    # Raw points up to DASHBOARD_MAP_MAX_POINTS, geohash cells beyond.
+    points = df[["lat", "lon"]].apply(pd.to_numeric, errors="coerce").dropna()
+    if len(points) <= DASHBOARD_MAP_MAX_POINTS:
+        st.map(points, use_container_width=True)
+        return
+    precision = _auto_precision(points["lat"].to_numpy(), points["lon"].to_numpy())
+    _render_cells(_cells_frame(_cell_sums(df, precision), precision), precision)
+
+
+def _render_cells(cells: pd.DataFrame, precision: int) -> None:
+    st.caption(f"{int(cells['count'].sum())} positions in {len(cells)} geohash-{precision} cells (size: rows, color: mean speed)")
+    st.map(cells, latitude="lat", longitude="lon", size="size", color="color", use_container_width=True)
+
+
+def _last_positions(df2: pd.DataFrame) -> pd.DataFrame:
+    return (
+        df2.dropna(subset=["ts", "lat", "lon"])
+        .sort_values("ts")
+        .groupby("device_id")
+        .tail(1)
+    )
+
+
+class _RealtimeWindow:
+    # The newest `size` rows of one fleet-day, newest first, with the speed
+    # distribution and last positions kept up to date as deltas are merged
+    # in, so a refresh only costs the rows that arrived since the last one.
+    def __init__(self, fleet_id: str, day_str: str, size: int):
+        self.key = (fleet_id.strip(), day_str, int(size))
+        self.size = int(size)
+        self.df = pd.DataFrame()
+        self.speed_hist = _speed_distribution(pd.DataFrame())
+        self.last_pos = pd.DataFrame()
+
+    @property
+    def last_ts(self) -> datetime | None:
+        if self.df.empty or pd.isna(self.df["ts"].iloc[0]):
+            return None
+        return self.df["ts"].iloc[0].to_pydatetime()
+
+    def merge(self, delta: pd.DataFrame) -> int:
+        if delta.empty:
+            return 0
+        delta = _realtime_frame(delta).sort_values("ts", ascending=False, kind="stable")
+        if not self.df.empty:
+            # ts >= last_ts re-reads the rows at the high-water mark.
+            top = self.df["ts"].iloc[0]
+            held = self.df.loc[self.df["ts"] == top, "device_id"]
+            delta = delta[~((delta["ts"] == top) & delta["device_id"].isin(held))]
+            if delta.empty:
+                return 0
+        combined = pd.concat([delta, self.df], ignore_index=True) if not self.df.empty else delta.reset_index(drop=True)
+        evicted = combined.iloc[self.size :]
+        self.df = combined.iloc[: self.size]
+        self.speed_hist = self.speed_hist + _speed_distribution(delta) - _speed_distribution(evicted)
+        self.last_pos = _last_positions(pd.concat([self.last_pos, delta], ignore_index=True))
+        return len(delta)
+
+
+def refresh_realtime_window(window: _RealtimeWindow | None, fleet_id: str, day_str: str, limit: int):
+    # Reuses the window while fleet, day and size are unchanged; returns
+    # (window, rows added, error).
+    if window is None or window.key != (fleet_id.strip(), day_str, int(limit)):
+        window = _RealtimeWindow(fleet_id, day_str, limit)
+    df, err = load_realtime_fleet(fleet_id, day_str, limit, since=window.last_ts)
+    if err:
+        return window, 0, err
+    return window, window.merge(df), ""
+
+
+_SEVERITIES = ("LOW", "MED", "HIGH")
+
+
+def _alerts_since(fleet_id: str, day_str: str, since: datetime | None, limit: int) -> pd.DataFrame:
+    # Newest alerts of the day across severities, at or after since.
+    session = _ensure_session_cached()
+    ts_filter = "" if since is None else " AND ts>=?"
+    query = f"SELECT ts, severity, device_id, alert_type, message FROM {_qualify_table('alerts_by_fleet_day')} WHERE fleet_id=? AND day=? AND severity=?{ts_filter} LIMIT ?"
+    day_value = _parse_iso_date(day_str)
+    keys = [(fleet_id, day_value, sev) if since is None else (fleet_id, day_value, sev, since) for sev in _SEVERITIES]
+    return _merge_newest(session, query, keys, limit)
+
+
+class _LiveView:
+    # What viewers read: replaced as a whole after each poll, never mutated.
+    __slots__ = ("df", "speed_hist", "last_pos", "alerts", "updated_at", "error")
+
+    def __init__(self, df, speed_hist, last_pos, alerts, updated_at, error=""):
+        self.df = df
+        self.speed_hist = speed_hist
+        self.last_pos = last_pos
+        self.alerts = alerts
+        self.updated_at = updated_at
+        self.error = error
+
+
+class _LiveFleet:
+    # Today's rolling telemetry window and alerts of one fleet, advanced by
+    # delta reads (ts >= newest row held) on every poll.
+    def __init__(self, fleet_id: str):
+        self.fleet_id = fleet_id
+        self.last_viewed = time.monotonic()
+        self.ready = threading.Event()
+        self.view: _LiveView | None = None
+        self._window: _RealtimeWindow | None = None
+        self._alerts = pd.DataFrame()
+
+    def poll(self) -> None:
+        day_str = datetime.now(timezone.utc).date().isoformat()
+        if self._window is None or self._window.key[1] != day_str:
+            self._window = _RealtimeWindow(self.fleet_id, day_str, DASHBOARD_LIVE_ROWS)
+            self._alerts = pd.DataFrame()
+
+        error = ""
+        # The loaders' own result cache is bypassed: this poller is the cache.
+        df, err = load_realtime_fleet.__wrapped__(self.fleet_id, day_str, DASHBOARD_LIVE_ROWS, self._window.last_ts)
+        if err:
+            error = err
+        else:
+            self._window.merge(df)
+
+        try:
+            since = None if self._alerts.empty else self._alerts["ts"].iloc[0].to_pydatetime()
+            delta = _alerts_since(self.fleet_id, day_str, since, DASHBOARD_LIVE_ALERTS)
+            if not delta.empty:
+                merged = pd.concat([delta, self._alerts], ignore_index=True) if not self._alerts.empty else delta
+                # ts >= since re-reads the alerts at the high-water mark.
+                merged = merged.drop_duplicates(subset=["ts", "severity", "device_id", "alert_type"])
+                self._alerts = merged.head(DASHBOARD_LIVE_ALERTS).reset_index(drop=True)
+        except Exception as exc:
+            error = error or str(exc)
+
+        window = self._window
+        self.view = _LiveView(window.df, window.speed_hist, window.last_pos, self._alerts, time.time(), error)
+        self.ready.set()
+
+    def fail(self, error: str) -> None:
+        # Keeps serving the previous snapshot, flagged with the error.
+        previous = self.view
+        if previous is None:
+            self.view = _LiveView(pd.DataFrame(), _speed_distribution(pd.DataFrame()), pd.DataFrame(), pd.DataFrame(), time.time(), error)
+        else:
+            self.view = _LiveView(previous.df, previous.speed_hist, previous.last_pos, previous.alerts, previous.updated_at, error)
+        self.ready.set()
+
+
+class _LiveService:
+    # One daemon thread per process polls every watched fleet; viewers only
+    # read the latest _LiveView, so cluster load does not grow with screens.
+    def __init__(self):
+        self._fleets: dict[str, _LiveFleet] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="live-snapshots", daemon=True)
+        self._thread.start()
+
+    def watch(self, fleet_id: str) -> _LiveFleet:
+        key = fleet_id.strip()
+        with self._lock:
+            fleet = self._fleets.get(key)
+            if fleet is None:
+                fleet = self._fleets[key] = _LiveFleet(key)
+                self._wake.set()
+            fleet.last_viewed = time.monotonic()
+        return fleet
+
+    def watched(self) -> list[str]:
+        with self._lock:
+            return sorted(self._fleets)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(DASHBOARD_LIVE_POLL_S)
+            self._wake.clear()
+            now = time.monotonic()
+            with self._lock:
+                for key in [k for k, f in self._fleets.items() if now - f.last_viewed > DASHBOARD_LIVE_IDLE_S]:
+                    del self._fleets[key]
+                fleets = list(self._fleets.values())
+            for fleet in fleets:
+                try:
+                    fleet.poll()
+                except Exception as exc:
+                    fleet.fail(str(exc))
+
+
+@st.cache_resource(show_spinner=False)
+def _live_service() -> _LiveService:
+    return _LiveService()
+
+
+def _render_live(fleet_id: str) -> None:
+    if not fleet_id.strip():
+        st.error("fleet_id is required")
+        return
+    fleet = _live_service().watch(fleet_id)
+    if not fleet.ready.wait(timeout=5.0):
+        st.info("Waiting for the first background poll…")
+        return
+    view = fleet.view
+    if view.error:
+        st.warning(f"Last poll failed, showing the previous snapshot: {view.error}")
+    st.caption(
+        f"Shared snapshot of today, {time.time() - view.updated_at:.0f}s old"
+        f" · fleets polled: {', '.join(_live_service().watched())}"
+    )
+    _render_window_body(fleet_id, datetime.now(timezone.utc).date().isoformat(), view.df, view.speed_hist, view.last_pos)
+    if not view.alerts.empty:
+        st.subheader("Latest alerts")
+        st.dataframe(view.alerts, use_container_width=True)
+
+
+def _render_realtime(fleet_id: str, day_str: str, limit: int, refresh: bool) -> None:
+    window = st.session_state.get("rt_window")
+    if refresh:
+        window, added, err = refresh_realtime_window(window, fleet_id, day_str, limit)
+        st.session_state["rt_window"] = window
+        if err:
+            st.error(err)
+            return
+        st.caption(
+            "Data source: telemetry_by_fleet_day"
+            + ("" if FLEET_BUCKETING == "none" else f"_bucketed ({FLEET_BUCKETING} buckets)")
+            + f" · +{added} new rows at {datetime.now().strftime('%H:%M:%S')}"
+        )
+    if window is None or window.key != (fleet_id.strip(), day_str, int(limit)):
+        return
+    _render_window_body(fleet_id, day_str, window.df, window.speed_hist, window.last_pos)
+
+
+def _render_window_body(fleet_id: str, day_str: str, df2: pd.DataFrame, speed_hist: pd.Series, window_last_pos: pd.DataFrame) -> None:
+    st.dataframe(df2, use_container_width=True)
+    if df2.empty:
+        st.info("No data yet. Start the ETL generator (fleet-etl) and retry.")
+        return
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Devices (seen)", str(df2["device_id"].nunique()))
+    c2.metric("Rows", str(len(df2)))
+    c3.metric("Latest ts", str(df2["ts"].max()))
+    c4.metric("Oldest ts", str(df2["ts"].min()))
+
+    st.subheader(f"Speed distribution ({DASHBOARD_SPEED_BIN_KMH:g} km/h bins)")
+    st.bar_chart(speed_hist, use_container_width=True)
+
+    # Today: every device of the fleet from latest_telemetry_by_device; other
+    # days (or fleets without devices_by_fleet rows): the window's devices.
+    last_pos = window_last_pos
+    source = "devices in the window above"
+    if _parse_iso_date(day_str) == datetime.now(timezone.utc).date():
+        snapshot, err = load_fleet_snapshot(fleet_id)
+        if err:
+            st.warning(f"Fleet snapshot unavailable: {err}")
+        elif not snapshot.empty:
+            last_pos = snapshot
+            source = f"all {len(snapshot)} devices (latest_telemetry_by_device)"
+            if snapshot.attrs.get("failed"):
+                st.warning(f"{snapshot.attrs['failed']} device reads failed; their positions are missing.")
+    if not last_pos.empty:
+        st.subheader("Last positions")
+        st.caption(f"Source: {source}")
+        _render_positions(last_pos)
+
+
+def _render_stream(key: str, open_stream) -> None:
+    # Whole-day paged view: "Load" starts from the top of the day, "Load more"
+    # resumes from the saved cursor and replaces the rows on screen, so a
+    # session never holds more than one memory budget of rows.
+    state_key = f"{key}_stream"
+    c1, c2 = st.columns(2)
+    start = c1.button("Load whole day (paged)", key=f"{key}_stream_start")
+    more = c2.button(
+        "Load more",
+        key=f"{key}_stream_more",
+        disabled=st.session_state.get(state_key, {}).get("cursor") is None,
+    )
+    if not (start or more):
+        return
+
+    cursor = None if start else st.session_state[state_key]["cursor"]
+    offset = 0 if start else st.session_state[state_key]["offset"]
+    status = st.empty()
+    table = st.empty()
+    last_render = [0.0]
+
+    def on_page(frames, used):
+        rows = sum(len(f) for f in frames)
+        status.caption(f"Streaming… {rows} rows, {used / 1e6:.1f} MB")
+        now = time.monotonic()
+        if now - last_render[0] >= 1.0:
+            last_render[0] = now
+            table.dataframe(pd.concat(frames, ignore_index=True), use_container_width=True)
+
+    try:
+        frames, cursor = _collect_pages(open_stream(cursor), int(DASHBOARD_MEMORY_BUDGET_MB * 1e6), on_page)
+    except Exception as exc:
+        status.empty()
+        st.error(str(exc))
+        return
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    st.session_state[state_key] = {"cursor": cursor, "offset": offset + len(df)}
+    if df.empty:
+        status.caption("No rows.")
+    elif cursor is None:
+        status.caption(f"Rows {offset + 1}–{offset + len(df)} of the day (end of day)")
+    else:
+        status.caption(f"Rows {offset + 1}–{offset + len(df)} of the day (memory budget {DASHBOARD_MEMORY_BUDGET_MB:g} MB reached, use Load more)")
+    table.dataframe(df, use_container_width=True)
+
+
 st.set_page_config(page_title="Fleet IoT Dashboard", layout="wide")
 
 st.title("Fleet IoT Dashboard")
@@ -200,9 +1271,12 @@ st.title("Fleet IoT Dashboard")
 with st.sidebar:
     st.subheader("Connection")
     st.code(
-        f"hosts={','.join(CASSANDRA_CONTACT_POINTS)}\nport={CASSANDRA_PORT}\nkeyspace={CASSANDRA_KEYSPACE}",
+        f"hosts={','.join(CASSANDRA_CONTACT_POINTS)}\nport={CASSANDRA_PORT}\nkeyspace={CASSANDRA_KEYSPACE}"
+        f"\nlocal_dc={CASSANDRA_LOCAL_DC}\nconsistency={CASSANDRA_CONSISTENCY}",
         language="text",
     )
+    st.subheader("Result cache")
+    st.json(_result_cache().stats())
 
 tabs = st.tabs(["Devices", "Latest", "Alerts", "Telemetry", "Realtime Analytics"])
 
@@ -246,9 +1320,13 @@ with tabs[2]:
     st.subheader("Alerts")
     alerts_fleet_id = st.text_input("fleet_id", value="FLEET_PARIS", key="alerts_fleet_id")
     alerts_day = st.date_input("day", value=date.today(), key="alerts_day")
-    alerts_sev = st.selectbox("severity", options=["LOW", "MED", "HIGH"], index=2, key="alerts_sev")
+    alerts_to = st.date_input("to", value=date.today(), key="alerts_to")
+    alerts_sevs = st.multiselect("severity", options=list(_SEVERITIES), default=["HIGH"], key="alerts_sevs")
     if st.button("Load alerts", key="load_alerts"):
-        df, err = load_alerts(alerts_fleet_id, alerts_day.isoformat(), alerts_sev)
+        if alerts_to == alerts_day and len(alerts_sevs) == 1:
+            df, err = load_alerts(alerts_fleet_id, alerts_day.isoformat(), alerts_sevs[0])
+        else:
+            df, err = load_alerts_range(alerts_fleet_id, alerts_day.isoformat(), alerts_to.isoformat(), tuple(alerts_sevs), 1000)
         if err:
             st.error(err)
         else:
@@ -260,9 +1338,13 @@ with tabs[3]:
     st.subheader("Telemetry")
     tel_device_id = st.text_input("device_id", value="BUS-001", key="tel_device_id")
     tel_day = st.date_input("day", value=date.today(), key="tel_day")
+    tel_to = st.date_input("to", value=date.today(), key="tel_to")
     tel_limit = st.slider("limit", min_value=1, max_value=500, value=50, step=1, key="tel_limit")
     if st.button("Load telemetry", key="load_telemetry"):
-        df, err = load_telemetry(tel_device_id, tel_day.isoformat(), int(tel_limit))
+        if tel_to == tel_day:
+            df, err = load_telemetry(tel_device_id, tel_day.isoformat(), int(tel_limit))
+        else:
+            df, err = load_telemetry_range(tel_device_id, tel_day.isoformat(), tel_to.isoformat(), int(tel_limit))
         if err:
             st.error(err)
         else:
@@ -275,13 +1357,13 @@ with tabs[3]:
                     df_plot = df_plot.set_index("ts")
                     for col in ["speed_kmh", "battery_pct", "temp_c"]:
                         if col in df_plot.columns:
-                            numeric_series = pd.to_numeric(df_plot[col], errors="coerce")
+                            numeric_series = _downsample(pd.to_numeric(df_plot[col], errors="coerce"))
                             st.line_chart(numeric_series.to_frame(name=col), use_container_width=True)
                 if "lat" in df.columns and "lon" in df.columns:
-                    map_df = df[["lat", "lon"]].copy()
-                    map_df["lat"] = pd.to_numeric(map_df["lat"], errors="coerce")
-                    map_df["lon"] = pd.to_numeric(map_df["lon"], errors="coerce")
-                    st.map(map_df.dropna(), use_container_width=True)
+                    _render_positions(df)
+
+    st.divider()
+    _render_stream("tel", lambda cursor: stream_device_day(tel_device_id, tel_day.isoformat(), cursor))
 
 with tabs[4]:
     st.subheader("Realtime analytics (fleet)")
@@ -289,51 +1371,72 @@ with tabs[4]:
     rt_day = st.date_input("day", value=date.today(), key="rt_day")
     rt_limit = st.slider("limit", min_value=100, max_value=5000, value=1000, step=100, key="rt_limit")
 
-    if st.button("Refresh", key="rt_refresh"):
-        df, err = load_realtime_fleet(rt_fleet_id, rt_day.isoformat(), int(rt_limit))
+    rt_live = st.checkbox("Shared live view (today, polled in the background for all viewers)", key="rt_live")
+    if rt_live:
+        # Reads the process-wide snapshot only; no per-viewer queries.
+        st.fragment(run_every=DASHBOARD_LIVE_POLL_S)(lambda: _render_live(rt_fleet_id))()
+    else:
+        c1, c2 = st.columns(2)
+        rt_auto = c1.checkbox("Auto-refresh", key="rt_auto")
+        rt_every = c2.number_input("every (s)", min_value=1, max_value=300, value=5, step=1, key="rt_every")
+        rt_clicked = st.button("Refresh", key="rt_refresh")
+
+        # Auto-refresh reruns only this fragment; each run reads the delta since
+        # the newest row already on screen.
+        st.fragment(run_every=int(rt_every) if rt_auto else None)(
+            lambda: _render_realtime(rt_fleet_id, rt_day.isoformat(), int(rt_limit), rt_clicked or rt_auto)
+        )()
+
+    st.divider()
+    st.subheader("Date range (newest rows across days)")
+    c1, c2, c3 = st.columns(3)
+    rg_from = c1.date_input("from", value=date.today(), key="rt_range_from")
+    rg_to = c2.date_input("to", value=date.today(), key="rt_range_to")
+    rg_limit = c3.number_input("limit", min_value=1, max_value=DASHBOARD_RANGE_MAX_ROWS, value=5000, step=500, key="rt_range_limit")
+    if st.button("Load range", key="rt_range"):
+        df, err = load_realtime_fleet_range(rt_fleet_id, rg_from.isoformat(), rg_to.isoformat(), int(rg_limit))
         if err:
             st.error(err)
         else:
-            st.caption("Data source: telemetry_by_fleet_day")
+            st.caption(f"{len(df)} rows, newest first")
             st.dataframe(df, use_container_width=True)
 
-            if df.empty:
-                st.info("No data yet. Start the ETL generator (fleet-etl) and retry.")
-            else:
-                df2 = df.copy()
-                if "ts" in df2.columns:
-                    df2["ts"] = pd.to_datetime(df2["ts"], errors="coerce")
-
-                for col in ["speed_kmh", "battery_pct", "temp_c", "lat", "lon"]:
-                    if col in df2.columns:
-                        df2[col] = pd.to_numeric(df2[col], errors="coerce")
-
-                c1, c2, c3, c4 = st.columns(4)
-                c1.metric(
-                    "Devices (seen)",
-                    str(df2["device_id"].nunique() if "device_id" in df2.columns else 0),
-                )
-                c2.metric("Rows", str(len(df2)))
-                if "ts" in df2.columns:
-                    c3.metric("Latest ts", str(df2["ts"].max()))
-                    c4.metric("Oldest ts", str(df2["ts"].min()))
-                else:
-                    c3.metric("Latest ts", "")
-                    c4.metric("Oldest ts", "")
-
-                if "speed_kmh" in df2.columns:
-                    st.subheader("Speed distribution")
-                    st.bar_chart(
-                        df2["speed_kmh"].dropna().round().value_counts().sort_index(),
-                        use_container_width=True,
-                    )
-
-                if set(["device_id", "ts", "lat", "lon"]).issubset(df2.columns):
-                    st.subheader("Last positions")
-                    last_pos = (
-                        df2.dropna(subset=["ts", "lat", "lon"])
-                        .sort_values("ts")
-                        .groupby("device_id")
-                        .tail(1)
-                    )
-                    st.map(last_pos[["lat", "lon"]].dropna(), use_container_width=True)
+    st.divider()
+    st.subheader("Fleet-day heatmap")
+    rt_precision = st.slider("geohash precision", min_value=3, max_value=8, value=6, key="rt_precision")
+    if st.button("Load heatmap", key="rt_heatmap"):
+        cells, err = load_fleet_day_cells(rt_fleet_id, rt_day.isoformat(), int(rt_precision))
+        if err:
+            st.error(err)
+        elif cells.empty:
+            st.info("No positions for this day.")
+        else:
+            _render_cells(cells, int(rt_precision))
+            st.dataframe(cells.drop(columns=["size", "color"]).sort_values("count", ascending=False), use_container_width=True)
+
+    st.divider()
+    st.subheader("Whole day (paged)")
+    _render_stream("rt", lambda cursor: stream_fleet_day(rt_fleet_id, rt_day.isoformat(), cursor))
+
+    st.divider()
+    st.subheader("Per-minute rollups (whole day)")
+    if st.button("Load rollups", key="rt_rollups"):
+        rollups, err = load_fleet_rollups(rt_fleet_id, rt_day.isoformat())
+        if err:
+            st.error(err)
+        elif rollups.empty:
+            st.info("No rollups yet. The ETL writes them every ETL_ROLLUP_FLUSH_MS.")
+        else:
+            st.caption("Data source: telemetry_rollup_by_fleet_day")
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Events (day)", str(int(rollups["event_count"].sum())))
+            c2.metric("Peak active devices / min", str(int(rollups["active_devices"].max())))
+            c3.metric("Max speed (km/h)", f"{rollups['speed_max'].max():.1f}")
+            c4.metric("Max temp (°C)", f"{rollups['temp_max'].max():.1f}")
+            st.line_chart(rollups[["event_count", "active_devices"]], use_container_width=True)
+            st.line_chart(rollups[["speed_mean", "speed_max"]], use_container_width=True)
+            st.line_chart(rollups[["battery_min", "temp_max"]], use_container_width=True)
+            speed_hist = rollups.attrs.get("speed_hist")
+            if speed_hist is not None and not speed_hist.empty:
+                st.subheader("Speed distribution (10 km/h buckets)")
+                st.bar_chart(speed_hist, use_container_width=True)
@@ -1,10 +1,26 @@
+import csv
+import heapq
+import http.server
+import itertools
+import json
+import math
+import multiprocessing
 import os
-import random
+import queue
+import signal
+import threading
 import time
-from datetime import date, datetime, timezone
+import zlib
+from datetime import date, datetime, timedelta, timezone
 
+import numpy as np
+from cassandra import ConsistencyLevel, CoordinationFailure, OperationTimedOut, Timeout, Unavailable
 from cassandra.auth import PlainTextAuthProvider
-from cassandra.cluster import Cluster
+from cassandra.cluster import EXEC_PROFILE_DEFAULT, Cluster, ExecutionProfile, NoHostAvailable
+from cassandra.connection import ConnectionException
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
+from cassandra.protocol import IsBootstrappingErrorMessage, OverloadedErrorMessage
+from cassandra.query import BatchStatement, BatchType
 
 
 def _env_list(name: str, default: str) -> list[str]:
@@ -17,23 +33,750 @@ CASSANDRA_PORT = int(os.getenv("CASSANDRA_PORT", "9042"))
 CASSANDRA_USER = os.getenv("CASSANDRA_USER", "")
 CASSANDRA_PASSWORD = os.getenv("CASSANDRA_PASSWORD", "")
 CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "atelier")
+CASSANDRA_LOCAL_DC = os.getenv("CASSANDRA_LOCAL_DC", "dc1")
+CASSANDRA_REMOTE_HOSTS_PER_DC = int(os.getenv("CASSANDRA_REMOTE_HOSTS_PER_DC", "0"))
+CASSANDRA_CONSISTENCY = os.getenv("CASSANDRA_CONSISTENCY", "LOCAL_QUORUM").strip().upper()
+CASSANDRA_REQUEST_TIMEOUT_S = float(os.getenv("CASSANDRA_REQUEST_TIMEOUT_S", "10"))
+CASSANDRA_COMPRESSION = os.getenv("CASSANDRA_COMPRESSION", "lz4").strip().lower()
+CASSANDRA_EXECUTOR_THREADS = int(os.getenv("CASSANDRA_EXECUTOR_THREADS", "2"))
 
 FLEETS = _env_list("ETL_FLEETS", "FLEET_PARIS,FLEET_LYON")
 DEVICES_PER_FLEET = int(os.getenv("ETL_DEVICES_PER_FLEET", "5"))
+MODE = os.getenv("ETL_MODE", "live").strip().lower()
 INTERVAL_MS = int(os.getenv("ETL_INTERVAL_MS", "500"))
 ALERT_PROB = float(os.getenv("ETL_ALERT_PROB", "0.03"))
+ALERT_RULES_PATH = os.getenv("ETL_ALERT_RULES", "")
+MAX_IN_FLIGHT = int(os.getenv("ETL_MAX_IN_FLIGHT", "0"))
+WORKERS = int(os.getenv("ETL_WORKERS", "1"))
+STATS_INTERVAL_S = float(os.getenv("ETL_STATS_INTERVAL_S", "10"))
+SHUTDOWN_TIMEOUT_S = float(os.getenv("ETL_SHUTDOWN_TIMEOUT_S", "20"))
+# Crashed workers are restarted after a per-shard delay that doubles on every
+# crash up to ETL_RESTART_BACKOFF_MAX_S, and drops back to ETL_RESTART_BACKOFF_S
+# once a worker has stayed up for ETL_RESTART_RESET_S.
+RESTART_BACKOFF_S = float(os.getenv("ETL_RESTART_BACKOFF_S", "1"))
+RESTART_BACKOFF_MAX_S = float(os.getenv("ETL_RESTART_BACKOFF_MAX_S", "60"))
+RESTART_RESET_S = float(os.getenv("ETL_RESTART_RESET_S", "60"))
+TICK_BATCH = int(os.getenv("ETL_TICK_BATCH", "1"))
+# Live loop: every device reports every ETL_REPORT_INTERVAL_MS (its own
+# interval is drawn once within +/- ETL_REPORT_SPREAD of it, and each report
+# is jittered by +/- ETL_REPORT_JITTER). 0 falls back to picking
+# ETL_TICK_BATCH random devices every ETL_INTERVAL_MS.
+REPORT_INTERVAL_MS = int(os.getenv("ETL_REPORT_INTERVAL_MS", "5000"))
+REPORT_SPREAD = float(os.getenv("ETL_REPORT_SPREAD", "0.2"))
+REPORT_JITTER = float(os.getenv("ETL_REPORT_JITTER", "0.1"))
+SCHEDULE_MAX_BATCH = int(os.getenv("ETL_SCHEDULE_MAX_BATCH", "5000"))
+# Open-loop target in events/s across all workers; 0 keeps the closed loop
+# paced by ETL_INTERVAL_MS.
+TARGET_RATE = float(os.getenv("ETL_TARGET_RATE", "0"))
+METRICS_PORT = int(os.getenv("ETL_METRICS_PORT", "0"))
+LATEST_FLUSH_MS = int(os.getenv("ETL_LATEST_FLUSH_MS", "0"))
+LATEST_FLUSH_DIRTY = int(os.getenv("ETL_LATEST_FLUSH_DIRTY", "10000"))
+# Partitioning of fleet-wide telemetry: "none" writes telemetry_by_fleet_day
+# ((fleet_id, day)); "hour" (UTC hour of ts) and "hash" (crc32(device_id) %
+# ETL_FLEET_BUCKETS) write telemetry_by_fleet_day_bucketed ((fleet_id, day,
+# bucket)). The dashboard must be started with the same FLEET_BUCKETING.
+FLEET_BUCKETING = os.getenv("ETL_FLEET_BUCKETING", "none").strip().lower()
+FLEET_BUCKETS = int(os.getenv("ETL_FLEET_BUCKETS", "8"))
+ROLLUP_FLUSH_MS = int(os.getenv("ETL_ROLLUP_FLUSH_MS", "5000"))
+ROLLUP_LATENESS_S = float(os.getenv("ETL_ROLLUP_LATENESS_S", "120"))
+ROLLUP_SPEED_BUCKET_KMH = 10
+ROLLUP_SPEED_BUCKETS = 16
+BATCH_WINDOW_MS = int(os.getenv("ETL_BATCH_WINDOW_MS", "0"))
+BATCH_MAX_ROWS = int(os.getenv("ETL_BATCH_MAX_ROWS", "50"))
+# Stay under Cassandra's default batch_size_warn_threshold (5 KiB).
+BATCH_MAX_BYTES = int(os.getenv("ETL_BATCH_MAX_BYTES", "5000"))
+
+# Writes that fail because the cluster is down, slow or overloaded are
+# appended to a local spill log (one directory per shard) instead of killing
+# the worker, and replayed in the background once the cluster answers again.
+# Empty disables spilling.
+SPILL_DIR = os.getenv("ETL_SPILL_DIR", "")
+SPILL_MAX_MB = int(os.getenv("ETL_SPILL_MAX_MB", "1024"))
+SPILL_SEGMENT_MB = int(os.getenv("ETL_SPILL_SEGMENT_MB", "16"))
+SPILL_BACKOFF_S = float(os.getenv("ETL_SPILL_BACKOFF_S", "5"))
+SPILL_DRAIN_CONCURRENCY = int(os.getenv("ETL_SPILL_DRAIN_CONCURRENCY", "256"))
+
+BACKFILL_START = os.getenv("ETL_BACKFILL_START", "")
+BACKFILL_END = os.getenv("ETL_BACKFILL_END", "")
+BACKFILL_STEP_MS = int(os.getenv("ETL_BACKFILL_STEP_MS", "60000"))
+BACKFILL_RATE = float(os.getenv("ETL_BACKFILL_RATE", "0"))
+BACKFILL_CHECKPOINT = os.getenv("ETL_BACKFILL_CHECKPOINT", "")
+BACKFILL_CHECKPOINT_S = float(os.getenv("ETL_BACKFILL_CHECKPOINT_S", "5"))
+BACKFILL_CHUNK = int(os.getenv("ETL_BACKFILL_CHUNK", "1000"))
+
+SEVERITIES = ["LOW", "MED", "HIGH"]
+
+
+def _execution_profile() -> ExecutionProfile:
+    # Token-aware routing on top of local-DC round robin: writes go straight to
+    # a replica in the local DC instead of being forwarded by a coordinator.
+    return ExecutionProfile(
+        load_balancing_policy=TokenAwarePolicy(
+            DCAwareRoundRobinPolicy(
+                local_dc=CASSANDRA_LOCAL_DC or None,
+                used_hosts_per_remote_dc=CASSANDRA_REMOTE_HOSTS_PER_DC,
+            )
+        ),
+        consistency_level=ConsistencyLevel.name_to_value[CASSANDRA_CONSISTENCY],
+        request_timeout=CASSANDRA_REQUEST_TIMEOUT_S,
+    )
 
 
 def _connect():
+    kwargs = {
+        "contact_points": CASSANDRA_CONTACT_POINTS,
+        "port": CASSANDRA_PORT,
+        "execution_profiles": {EXEC_PROFILE_DEFAULT: _execution_profile()},
+        "compression": CASSANDRA_COMPRESSION if CASSANDRA_COMPRESSION not in ("", "none") else False,
+        "executor_threads": CASSANDRA_EXECUTOR_THREADS,
+    }
     if CASSANDRA_USER and CASSANDRA_PASSWORD:
-        auth = PlainTextAuthProvider(username=CASSANDRA_USER, password=CASSANDRA_PASSWORD)
-        cluster = Cluster(contact_points=CASSANDRA_CONTACT_POINTS, port=CASSANDRA_PORT, auth_provider=auth)
-    else:
-        cluster = Cluster(contact_points=CASSANDRA_CONTACT_POINTS, port=CASSANDRA_PORT)
+        kwargs["auth_provider"] = PlainTextAuthProvider(username=CASSANDRA_USER, password=CASSANDRA_PASSWORD)
+    cluster = Cluster(**kwargs)
     session = cluster.connect()
     return cluster, session
 
 
+class _LatencyHistogram:
+    # HDR-style log-linear histogram of latencies in microseconds: values below
+    # 2 * SUB are exact, above that every power of two is split into SUB linear
+    # buckets (about 3% relative error).
+    SUB_BITS = 5
+    SUB = 1 << SUB_BITS
+
+    def __init__(self):
+        self.counts = [0] * ((64 - self.SUB_BITS) * self.SUB)
+        self.count = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def record(self, seconds: float) -> None:
+        us = max(0, int(seconds * 1_000_000))
+        self.counts[self._index(us)] += 1
+        self.count += 1
+        self.sum_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def copy(self) -> "_LatencyHistogram":
+        other = _LatencyHistogram()
+        other.counts = list(self.counts)
+        other.count = self.count
+        other.sum_us = self.sum_us
+        other.max_us = self.max_us
+        return other
+
+    def cumulative(self, bounds_s: list[float]) -> list[int]:
+        # Prometheus "le" counts: every bucket whose lower edge is at or below
+        # the bound, i.e. up to and including the bucket the bound falls in, so
+        # samples exactly on a bound are never dropped.
+        out = []
+        for bound in bounds_s:
+            last = self._index(round(bound * 1_000_000))
+            out.append(sum(self.counts[: last + 1]))
+        return out
+
+    def percentile(self, q: float) -> float:
+        # Returns milliseconds.
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(self._value(i), self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def summary(self) -> str:
+        return (
+            f"n={self.count} p50={self.percentile(0.5):.2f}ms p99={self.percentile(0.99):.2f}ms "
+            f"p999={self.percentile(0.999):.2f}ms max={self.max_us / 1000.0:.2f}ms"
+        )
+
+    @classmethod
+    def _index(cls, us: int) -> int:
+        if us < 2 * cls.SUB:
+            return us
+        shift = us.bit_length() - 1 - cls.SUB_BITS
+        return (shift + 1) * cls.SUB + (us >> shift) - cls.SUB
+
+    @classmethod
+    def _value(cls, index: int) -> int:
+        # Upper edge of the bucket, so percentiles never under-report.
+        if index < 2 * cls.SUB:
+            return index
+        shift = index // cls.SUB - 1
+        return (((index % cls.SUB) + cls.SUB + 1) << shift) - 1
+
+
+class _LatencyRecorder:
+    # Per-label interval and cumulative histograms plus error counts, fed from
+    # driver callback threads.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._interval: dict[str, _LatencyHistogram] = {}
+        self._total: dict[str, _LatencyHistogram] = {}
+        self._errors: dict[tuple[str, str], int] = {}
+
+    def record(self, label: str, seconds: float) -> None:
+        with self._lock:
+            hist = self._interval.get(label)
+            if hist is None:
+                hist = self._interval[label] = _LatencyHistogram()
+            hist.record(seconds)
+            total = self._total.get(label)
+            if total is None:
+                total = self._total[label] = _LatencyHistogram()
+            total.record(seconds)
+
+    def record_error(self, label: str, exc: BaseException) -> None:
+        key = (label, type(exc).__name__)
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def take_interval(self) -> dict[str, _LatencyHistogram]:
+        with self._lock:
+            interval = self._interval
+            self._interval = {}
+        return interval
+
+    def snapshot(self) -> tuple[dict[str, _LatencyHistogram], dict[tuple[str, str], int]]:
+        with self._lock:
+            return {k: h.copy() for k, h in self._total.items()}, dict(self._errors)
+
+    def report(self, prefix: str, cumulative: bool = False) -> None:
+        interval = self.take_interval()
+        hists = self.snapshot()[0] if cumulative else interval
+        for label in sorted(hists):
+            print(f"[etl] {prefix}latency {label} {hists[label].summary()}")
+
+
+class _AsyncWriter:
+    # With max_in_flight <= 0 every write blocks (legacy behaviour). Otherwise
+    # writes are pipelined through execute_async and submit() blocks once
+    # max_in_flight requests are outstanding. Failures of completed futures are
+    # re-raised on the next submit() or flush().
+    #
+    # Latency is measured from the intended start (when the event was due, see
+    # ETL_TARGET_RATE) to completion, so time spent waiting for a free slot is
+    # included instead of being hidden by the backpressure.
+    #
+    # With a spill queue, rows of writes that fail with a transient error are
+    # spilled instead of raised, and for SPILL_BACKOFF_S afterwards new writes
+    # go straight to the spill rather than waiting on a dead cluster. rows is
+    # the list of row params behind a batch, for spilling them one by one.
+    def __init__(self, session, max_in_flight: int, spill: "_SpillQueue | None" = None):
+        self._session = session
+        self._spill = spill
+        self._spill_until = 0.0
+        self._max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._errors: list[BaseException] = []
+        self._defer_errors = False
+        self.latency = _LatencyRecorder()
+
+    def submit(self, statement, params, label: str = "", intended: float | None = None, rows: list | None = None) -> None:
+        self.raise_errors()
+        start = time.monotonic() if intended is None else intended
+        spill_rows = None
+        if self._spill is not None:
+            spill_rows = (rows if rows is not None else [params], int(time.time() * 1_000_000))
+            if self.spilling and self._spill.append(label, *spill_rows):
+                return
+        if self._max_in_flight <= 0:
+            try:
+                self._session.execute(statement, params)
+            except Exception as exc:
+                self.latency.record_error(label, exc)
+                if not self._spilled(exc, label, spill_rows):
+                    raise
+                return
+            self.latency.record(label, time.monotonic() - start)
+            return
+
+        self._slots.acquire()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._session.execute_async(statement, params)
+        except Exception:
+            self._release()
+            raise
+        future.add_callbacks(
+            self._on_success,
+            self._on_error,
+            callback_args=(label, start),
+            errback_args=(label, start, spill_rows),
+        )
+
+    @property
+    def spilling(self) -> bool:
+        return time.monotonic() < self._spill_until
+
+    def back_off(self) -> None:
+        self._spill_until = time.monotonic() + SPILL_BACKOFF_S
+
+    def _spilled(self, exc: BaseException, label: str, spill_rows) -> bool:
+        if spill_rows is None or not isinstance(exc, _SPILLABLE_ERRORS):
+            return False
+        if not self._spill.append(label, *spill_rows):
+            return False
+        self.back_off()
+        return True
+
+    def flush(self) -> None:
+        errors = self.drain()
+        if errors:
+            raise errors[0]
+
+    def drain(self) -> list[BaseException]:
+        # Waits for in-flight requests and returns their failures instead of
+        # raising them.
+        with self._lock:
+            while self._in_flight:
+                self._idle.wait()
+            errors = self._errors
+            self._errors = []
+        return errors
+
+    def defer_errors(self, defer: bool) -> None:
+        # While deferred, submit() keeps sending instead of raising earlier
+        # failures; they are collected by drain().
+        self._defer_errors = defer
+
+    def raise_errors(self) -> None:
+        with self._lock:
+            if not self._errors or self._defer_errors:
+                return
+            exc = self._errors[0]
+            self._errors.clear()
+        raise exc
+
+    def _on_success(self, _rows, label: str, start: float) -> None:
+        self.latency.record(label, time.monotonic() - start)
+        self._release()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _on_error(self, exc: BaseException, label: str, start: float, spill_rows=None) -> None:
+        self.latency.record_error(label, exc)
+        if not self._spilled(exc, label, spill_rows):
+            with self._lock:
+                self._errors.append(exc)
+        self._release()
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.notify_all()
+        self._slots.release()
+
+
+# Errors a later replay can fix: the cluster (or a replica set) was down,
+# overloaded or too slow. Anything else (bad query, bad data) still raises.
+_SPILLABLE_ERRORS = (
+    Unavailable,
+    Timeout,
+    CoordinationFailure,
+    OperationTimedOut,
+    NoHostAvailable,
+    ConnectionException,
+    OverloadedErrorMessage,
+    IsBootstrappingErrorMessage,
+)
+
+
+def _spill_encode(value):
+    if isinstance(value, datetime):
+        return {"t": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, dict):
+        return {"m": list(value.items())}
+    return value
+
+
+def _spill_decode(value):
+    if isinstance(value, dict):
+        if "t" in value:
+            return datetime.fromisoformat(value["t"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        return dict(value["m"])
+    return value
+
+
+class _SpillQueue:
+    # Bounded append-only spill log: one JSON line per row ([label, write
+    # timestamp in us, params]) in numbered segment files. The active segment
+    # is sealed once it reaches segment_bytes; sealed segments are replayed
+    # oldest first and deleted once every row in them has been written.
+    # Segments left by a previous run are picked up on start.
+    def __init__(self, directory: str, max_bytes: int, segment_bytes: int):
+        os.makedirs(directory, exist_ok=True)
+        self._dir = directory
+        self._max_bytes = max_bytes
+        self._segment_bytes = max(1, segment_bytes)
+        self._lock = threading.Lock()
+        self._sealed = sorted(int(n[:-4]) for n in os.listdir(directory) if n.endswith(".log") and n[:-4].isdigit())
+        self.pending_bytes = sum(os.path.getsize(self._path(n)) for n in self._sealed)
+        self._active = (self._sealed[-1] + 1) if self._sealed else 0
+        self._active_file = None
+        self._active_bytes = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    def _path(self, number: int) -> str:
+        return os.path.join(self._dir, f"{number:010d}.log")
+
+    def append(self, label: str, rows: list, written_us: int) -> bool:
+        # False when the spill is full; the caller then raises the write error.
+        data = "".join(
+            json.dumps([label, written_us, [_spill_encode(v) for v in params]], separators=(",", ":")) + "\n"
+            for params in rows
+        ).encode()
+        with self._lock:
+            if self.pending_bytes + len(data) > self._max_bytes:
+                return False
+            if self._active_file is None:
+                self._active_file = open(self._path(self._active), "ab")
+            self._active_file.write(data)
+            self._active_bytes += len(data)
+            self.pending_bytes += len(data)
+            self.spilled += len(rows)
+            if self._active_bytes >= self._segment_bytes:
+                self._seal()
+        return True
+
+    def _seal(self) -> None:
+        self._active_file.close()
+        self._active_file = None
+        self._sealed.append(self._active)
+        self._active += 1
+        self._active_bytes = 0
+
+    def oldest(self) -> int | None:
+        # Seals a partly filled active segment when nothing else is waiting,
+        # so a short outage is replayed without waiting for a full segment.
+        with self._lock:
+            if not self._sealed and self._active_file is not None:
+                self._active_file.flush()
+                self._seal()
+            return self._sealed[0] if self._sealed else None
+
+    def read(self, number: int) -> list[tuple[str, int, list]]:
+        records = []
+        with open(self._path(number), "rb") as f:
+            for line in f:
+                try:
+                    label, written_us, params = json.loads(line)
+                except ValueError:
+                    # Torn last line after a crash.
+                    continue
+                records.append((label, written_us, [_spill_decode(v) for v in params]))
+        return records
+
+    def remove(self, number: int, rows: int) -> None:
+        path = self._path(number)
+        size = os.path.getsize(path)
+        os.remove(path)
+        with self._lock:
+            self._sealed.remove(number)
+            self.pending_bytes -= size
+            self.replayed += rows
+
+    def close(self) -> None:
+        with self._lock:
+            if self._active_file is not None:
+                self._active_file.close()
+                self._active_file = None
+
+
+class _SpillDrainer:
+    # Background replay of the spill log with up to `concurrency` requests in
+    # flight. Rows are written USING TIMESTAMP of their original submission,
+    # so a replayed row never overwrites a newer one written since (latest
+    # positions, rollup rows). A segment that fails to replay is kept and
+    # retried after the writer's back-off.
+    def __init__(self, session, stmts: dict, spill: _SpillQueue, writer: "_AsyncWriter", concurrency: int):
+        self._session = session
+        self._replay = {
+            label: session.prepare(stmt.query_string + " USING TIMESTAMP ?") for label, stmt in stmts.items()
+        }
+        self._spill = spill
+        self._writer = writer
+        self._concurrency = max(1, concurrency)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="etl-spill-drainer", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=SHUTDOWN_TIMEOUT_S)
+
+    def _run(self) -> None:
+        while not self._stop.wait(0.5):
+            replayed = 0
+            while not self._stop.is_set() and not self._writer.spilling:
+                number = self._spill.oldest()
+                if number is None:
+                    break
+                records = self._spill.read(number)
+                failed = self._replay_all(records)
+                if failed:
+                    print(f"[etl] spill replay of segment {number}: {failed}/{len(records)} rows failed, retrying later")
+                    self._writer.back_off()
+                    break
+                self._spill.remove(number, len(records))
+                replayed += len(records)
+            if replayed:
+                print(f"[etl] replayed {replayed} spilled rows, {self._spill.pending_bytes} bytes pending")
+
+    def _replay_all(self, records: list) -> int:
+        slots = threading.BoundedSemaphore(self._concurrency)
+        lock = threading.Lock()
+        done = threading.Event()
+        state = {"pending": len(records), "failed": 0}
+
+        def finish(failed: bool) -> None:
+            slots.release()
+            with lock:
+                state["pending"] -= 1
+                state["failed"] += failed
+                if not state["pending"]:
+                    done.set()
+
+        if not records:
+            return 0
+        for label, written_us, params in records:
+            slots.acquire()
+            try:
+                future = self._session.execute_async(self._replay[label], (*params, written_us))
+            except Exception:
+                finish(True)
+                continue
+            future.add_callbacks(lambda _rows: finish(False), lambda _exc: finish(True))
+        done.wait()
+        return state["failed"]
+
+
+def _estimate_bytes(params) -> int:
+    size = 0
+    for v in params:
+        size += len(v) if isinstance(v, str) else 8
+    return size
+
+
+class _PartitionBatcher:
+    # Buffers rows per (label, partition key) and sends each group as a
+    # single-partition UNLOGGED batch, either when the group reaches max_rows /
+    # max_bytes or when the buffering window elapses. A window <= 0 disables
+    # batching and forwards every row to the writer. A batch is timed from the
+    # earliest intended start of its rows.
+    def __init__(self, writer: _AsyncWriter, window_ms: int, max_rows: int, max_bytes: int):
+        self._writer = writer
+        self._window_s = window_ms / 1000.0
+        self._max_rows = max(1, max_rows)
+        self._max_bytes = max(1, max_bytes)
+        self._groups: dict[tuple, list] = {}
+        self._sizes: dict[tuple, int] = {}
+        self._window_start = time.monotonic()
+
+    def add(self, label: str, partition_key: tuple, statement, params, intended: float | None = None) -> None:
+        if self._window_s <= 0:
+            self._writer.submit(statement, params, label, intended)
+            return
+
+        key = (label, partition_key)
+        size = self._sizes.get(key, 0) + _estimate_bytes(params)
+        group = self._groups.setdefault(key, [])
+        if group and size > self._max_bytes:
+            self._send(label, group)
+            group.clear()
+            size = _estimate_bytes(params)
+        group.append((statement, params, time.monotonic() if intended is None else intended))
+        self._sizes[key] = size
+        if len(group) >= self._max_rows or size >= self._max_bytes:
+            self._send(label, self._groups.pop(key))
+            self._sizes.pop(key)
+
+    def poll(self) -> None:
+        if self._window_s > 0 and time.monotonic() - self._window_start >= self._window_s:
+            self.flush()
+
+    def flush(self) -> None:
+        groups = self._groups
+        self._groups = {}
+        self._sizes = {}
+        self._window_start = time.monotonic()
+        for (label, _), group in groups.items():
+            self._send(label, group)
+
+    def _send(self, label: str, group: list) -> None:
+        if len(group) == 1:
+            statement, params, intended = group[0]
+            self._writer.submit(statement, params, label, intended)
+            return
+        batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+        for statement, params, _ in group:
+            batch.add(statement, params)
+        self._writer.submit(batch, None, label, min(g[2] for g in group), [g[1] for g in group])
+
+
+class _LatestCache:
+    # Write-behind cache for latest_telemetry_by_device: keeps only the newest
+    # reading per device and upserts the dirty ones every flush_ms or once
+    # max_dirty devices are pending. flush_ms <= 0 writes through.
+    def __init__(self, writer: _AsyncWriter, statement, flush_ms: int, max_dirty: int):
+        self._writer = writer
+        self._statement = statement
+        self._flush_s = flush_ms / 1000.0
+        self._max_dirty = max(1, max_dirty)
+        self._dirty: dict[str, tuple] = {}
+        self._newest: dict[str, datetime] = {}
+        self._last_flush = time.monotonic()
+        self.coalesced = 0
+
+    def put(self, params: tuple, intended: float | None = None) -> None:
+        if self._flush_s <= 0:
+            self._writer.submit(self._statement, params, "ins_latest", intended)
+            return
+
+        device_id, ts = params[0], params[1]
+        newest = self._newest.get(device_id)
+        if newest is not None and ts < newest:
+            # Out-of-order reading (backfill); the row already holds a newer one.
+            self.coalesced += 1
+            return
+        self._newest[device_id] = ts
+        if device_id in self._dirty:
+            self.coalesced += 1
+        self._dirty[device_id] = params
+        if len(self._dirty) >= self._max_dirty:
+            self.flush()
+
+    def poll(self) -> None:
+        if self._flush_s > 0 and time.monotonic() - self._last_flush >= self._flush_s:
+            self.flush()
+
+    def flush(self) -> None:
+        dirty = self._dirty
+        self._dirty = {}
+        self._last_flush = time.monotonic()
+        for params in dirty.values():
+            self._writer.submit(self._statement, params, "ins_latest")
+
+
+def _rollup_source(shard: int) -> int:
+    # Live mode: 21 random non-zero bits above the shard number, so every
+    # process run owns its rows. Backfill keeps source = shard and rebuilds
+    # its open minutes from the checkpoint instead (see _run_backfill).
+    if MODE == "backfill":
+        return shard
+    run = int.from_bytes(os.urandom(3), "big") % ((1 << 21) - 1) + 1
+    return run << 10 | (shard & 0x3FF)
+
+
+class _MinuteRollup:
+    # Incremental per-fleet, per-minute aggregates for telemetry_rollup_by_fleet_day.
+    # Every worker writes its own partial row (see _rollup_source); devices are
+    # sharded disjointly so the dashboard can sum counts and active devices
+    # across sources. Open minutes are rewritten every flush_ms (the row holds
+    # the source's full aggregate, so the upsert is idempotent); minutes older
+    # than the newest event minus lateness are written one last time and dropped.
+    # Events for an already dropped minute are counted in `late` and ignored.
+    def __init__(self, writer: _AsyncWriter, statement, source: int, flush_ms: int, lateness_s: float):
+        self._writer = writer
+        self._statement = statement
+        self._source = source
+        self._flush_s = flush_ms / 1000.0
+        self._lateness = timedelta(seconds=lateness_s)
+        self._open: dict[tuple[str, datetime], list] = {}
+        self._watermark: datetime | None = None
+        self._closed_before: datetime | None = None
+        self._last_flush = time.monotonic()
+        self.late = 0
+
+    def add(self, fleet_id: str, device_id: str, ts: datetime, speed: float, battery: int, temp_c: float) -> None:
+        if self._flush_s <= 0:
+            return
+        minute = ts.replace(second=0, microsecond=0)
+        if self._closed_before is not None and minute < self._closed_before:
+            self.late += 1
+            return
+        if self._watermark is None or ts > self._watermark:
+            self._watermark = ts
+
+        key = (fleet_id, minute)
+        acc = self._open.get(key)
+        if acc is None:
+            # count, speed_sum, speed_max, battery_min, temp_max, devices, speed_hist
+            acc = self._open[key] = [0, 0.0, speed, battery, temp_c, set(), {}]
+        acc[0] += 1
+        acc[1] += speed
+        if speed > acc[2]:
+            acc[2] = speed
+        if battery < acc[3]:
+            acc[3] = battery
+        if temp_c > acc[4]:
+            acc[4] = temp_c
+        acc[5].add(device_id)
+        bucket = min(int(speed // ROLLUP_SPEED_BUCKET_KMH), ROLLUP_SPEED_BUCKETS - 1) * ROLLUP_SPEED_BUCKET_KMH
+        acc[6][bucket] = acc[6].get(bucket, 0) + 1
+
+    def poll(self) -> None:
+        if self._flush_s > 0 and time.monotonic() - self._last_flush >= self._flush_s:
+            self.flush()
+
+    def flush(self, final: bool = False) -> None:
+        self._last_flush = time.monotonic()
+        if not self._open:
+            return
+        cutoff = None
+        if self._watermark is not None and not final:
+            cutoff = (self._watermark - self._lateness).replace(second=0, microsecond=0)
+        for key in list(self._open):
+            fleet_id, minute = key
+            count, speed_sum, speed_max, battery_min, temp_max, devices, hist = self._open[key]
+            self._writer.submit(
+                self._statement,
+                (fleet_id, minute.date(), minute, self._source, count, speed_sum, speed_max, battery_min, temp_max, len(devices), hist),
+                "ins_rollup",
+            )
+            if final or minute < cutoff:
+                del self._open[key]
+        if cutoff is not None and (self._closed_before is None or cutoff > self._closed_before):
+            self._closed_before = cutoff
+
+    def state(self) -> dict:
+        # JSON-serialisable open minutes, saved with backfill checkpoints.
+        return {
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+            "closed_before": self._closed_before.isoformat() if self._closed_before else None,
+            "open": [
+                [fleet_id, minute.isoformat(), acc[0], acc[1], acc[2], acc[3], acc[4], sorted(acc[5]), list(acc[6].items())]
+                for (fleet_id, minute), acc in self._open.items()
+            ],
+        }
+
+    def restore(self, state: dict) -> None:
+        self._watermark = _parse_ts(state["watermark"]) if state.get("watermark") else None
+        self._closed_before = _parse_ts(state["closed_before"]) if state.get("closed_before") else None
+        self._open = {
+            (fleet_id, _parse_ts(minute)): [count, speed_sum, speed_max, battery_min, temp_max, set(devices), dict(hist)]
+            for fleet_id, minute, count, speed_sum, speed_max, battery_min, temp_max, devices, hist in state.get("open", [])
+        }
+
+
 def _ensure_keyspace(session):
     session.execute(
         f"CREATE KEYSPACE IF NOT EXISTS {CASSANDRA_KEYSPACE} WITH REPLICATION = {{'class':'NetworkTopologyStrategy','dc1':2,'dc2':2}} AND durable_writes = true"
@@ -63,6 +806,14 @@ def _ensure_tables(session):
         "CREATE TABLE IF NOT EXISTS telemetry_by_fleet_day (fleet_id text, day date, ts timestamp, device_id text, lat double, lon double, speed_kmh double, battery_pct int, temp_c double, zone text, PRIMARY KEY ((fleet_id, day), ts, device_id)) WITH CLUSTERING ORDER BY (ts DESC)"
     )
 
+    session.execute(
+        "CREATE TABLE IF NOT EXISTS telemetry_by_fleet_day_bucketed (fleet_id text, day date, bucket int, ts timestamp, device_id text, lat double, lon double, speed_kmh double, battery_pct int, temp_c double, zone text, PRIMARY KEY ((fleet_id, day, bucket), ts, device_id)) WITH CLUSTERING ORDER BY (ts DESC)"
+    )
+
+    session.execute(
+        "CREATE TABLE IF NOT EXISTS telemetry_rollup_by_fleet_day (fleet_id text, day date, minute timestamp, source int, event_count int, speed_sum double, speed_max double, battery_min int, temp_max double, active_devices int, speed_hist map<int, int>, PRIMARY KEY ((fleet_id, day), minute, source)) WITH CLUSTERING ORDER BY (minute DESC, source ASC)"
+    )
+
 
 def _fleet_center(fleet_id: str) -> tuple[float, float]:
     if fleet_id == "FLEET_PARIS":
@@ -80,6 +831,10 @@ def _device_prefix(fleet_id: str) -> str:
     return "VEH"
 
 
+def _fleet_zone(fleet_id: str) -> str:
+    return "PARIS-A" if fleet_id == "FLEET_PARIS" else "LYON-A"
+
+
 def _build_devices() -> dict[str, list[str]]:
     m: dict[str, list[str]] = {}
     for fleet in FLEETS:
@@ -88,77 +843,946 @@ def _build_devices() -> dict[str, list[str]]:
     return m
 
 
-def main():
-    random.seed(int(os.getenv("ETL_SEED", "0")) or None)
+class _DeviceState:
+    # Columnar device state indexed by device ordinal; tick() advances a whole
+    # batch of ordinals in one vectorized step.
+    def __init__(self, devices_by_fleet: dict[str, list[str]], rng: np.random.Generator):
+        self.fleets = list(devices_by_fleet)
+        self.zones = [_fleet_zone(f) for f in self.fleets]
+        self.device_ids = [d for devs in devices_by_fleet.values() for d in devs]
+        self.fleet_idx = np.repeat(
+            np.arange(len(self.fleets), dtype=np.int32),
+            [len(devs) for devs in devices_by_fleet.values()],
+        )
 
-    cluster, session = _connect()
-    try:
-        _ensure_keyspace(session)
-        _ensure_tables(session)
+        n = len(self.device_ids)
+        centers = np.array([_fleet_center(f) for f in self.fleets], dtype=np.float64).reshape(-1, 2)
+        self.lat = centers[self.fleet_idx, 0] + rng.uniform(-0.02, 0.02, n)
+        self.lon = centers[self.fleet_idx, 1] + rng.uniform(-0.02, 0.02, n)
+        self.battery = rng.integers(60, 101, n).astype(np.float64)
+        self.speed = np.zeros(n, dtype=np.float64)
+        self.temp = np.zeros(n, dtype=np.float64)
 
-        session.execute(f"USE {CASSANDRA_KEYSPACE}")
+    def __len__(self) -> int:
+        return len(self.device_ids)
+
+    def tick(self, idx: np.ndarray, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+        # idx must not contain duplicates (fancy-index updates would collapse).
+        n = len(idx)
+        self.lat[idx] += rng.uniform(-0.0015, 0.0015, n)
+        self.lon[idx] += rng.uniform(-0.0015, 0.0015, n)
+        self.battery[idx] = np.maximum(0.0, self.battery[idx] - rng.uniform(0.0, 0.05, n))
+
+        speed = np.maximum(0.0, rng.normal(35.0, 12.0, n))
+        temp = rng.normal(28.0, 4.0, n)
+        spike = rng.random(n) < 0.01
+        temp[spike] += rng.uniform(10.0, 20.0, int(spike.sum()))
+        self.speed[idx] = speed
+        self.temp[idx] = temp
+
+        anomaly = rng.random(n) < ALERT_PROB
+        severity = rng.integers(0, len(SEVERITIES), n)
+        return anomaly, severity
+
+
+class _DeviceScheduler:
+    # Event-time scheduler over device ordinals: a heap of (due, ordinal) with
+    # one entry per device, on the time.monotonic() clock. pop_due() drains
+    # what is due in due-time order (O(log n) per report) and re-arms those
+    # devices one interval after their previous due time, so per-device rates
+    # stay fixed even when the writer falls behind.
+    def __init__(self, n: int, interval_s: float, spread: float, jitter: float, rng: np.random.Generator, now: float):
+        spread = min(max(spread, 0.0), 0.9)
+        self._intervals = interval_s * rng.uniform(1.0 - spread, 1.0 + spread, n)
+        self._jitter = min(max(jitter, 0.0), 0.9)
+        first = now + rng.random(n) * self._intervals
+        self._heap = list(zip(first.tolist(), range(n)))
+        heapq.heapify(self._heap)
+
+    def next_due(self) -> float:
+        return self._heap[0][0]
+
+    def pop_due(self, now: float, rng: np.random.Generator, limit: int) -> tuple[np.ndarray, np.ndarray]:
+        # Returns (ordinals, due times); every ordinal appears at most once.
+        heap = self._heap
+        due: list[float] = []
+        idx: list[int] = []
+        while heap and heap[0][0] <= now and len(idx) < limit:
+            t, i = heapq.heappop(heap)
+            due.append(t)
+            idx.append(i)
+        idx_arr = np.array(idx, dtype=np.int64)
+        due_arr = np.array(due, dtype=np.float64)
+        if idx:
+            step = self._intervals[idx_arr]
+            if self._jitter > 0:
+                step = step * rng.uniform(1.0 - self._jitter, 1.0 + self._jitter, len(idx))
+            for t, i in zip((due_arr + step).tolist(), idx):
+                heapq.heappush(heap, (t, i))
+        return idx_arr, due_arr
+
+
+DEFAULT_ALERT_RULES = [
+    {
+        "name": "temp_high",
+        "type": "threshold",
+        "field": "temp_c",
+        "op": ">=",
+        "value": 40.0,
+        "alert_type": "TEMP_HIGH",
+        "severity": "HIGH",
+        "message": "Température > 40C",
+    },
+    {
+        "name": "anomaly",
+        "type": "anomaly",
+        "alert_type": "GEOFENCE",
+        "severity": "random",
+        "message": "Anomalie détectée",
+    },
+]
+
+_RULE_FIELDS = {"lat": 3, "lon": 4, "speed_kmh": 5, "battery_pct": 6, "temp_c": 7}
+_RULE_OPS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}
+
+
+def _points_in_polygon(lat: np.ndarray, lon: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    # Even-odd ray casting, vectorized over the points (polygon rows are lat, lon).
+    inside = np.zeros(len(lat), dtype=bool)
+    y0, x0 = polygon[:, 0], polygon[:, 1]
+    y1, x1 = np.roll(y0, -1), np.roll(x0, -1)
+    for j in range(len(polygon)):
+        if y0[j] == y1[j]:
+            continue
+        crosses = (y0[j] > lat) != (y1[j] > lat)
+        x_cross = x0[j] + (lat - y0[j]) * (x1[j] - x0[j]) / (y1[j] - y0[j])
+        inside ^= crosses & (lon < x_cross)
+    return inside
+
+
+class _AlertRule:
+    def __init__(self, spec: dict):
+        self.name = spec.get("name") or spec["type"]
+        self.kind = spec["type"]
+        self.alert_type = spec.get("alert_type", self.name.upper())
+        self.severity = spec.get("severity", "MED")
+        self.message = spec.get("message", self.alert_type)
+        self.suppress = timedelta(seconds=float(spec.get("suppress_s", 0)))
+        if self.severity != "random" and self.severity not in SEVERITIES:
+            raise ValueError(f"alert rule {self.name}: unknown severity {self.severity!r}")
+
+        if self.kind == "threshold":
+            self.field = _RULE_FIELDS[spec["field"]]
+            self.op = _RULE_OPS[spec["op"]]
+            self.value = float(spec["value"])
+        elif self.kind == "low_battery":
+            self.field = _RULE_FIELDS["battery_pct"]
+            self.op = np.less
+            self.value = float(spec.get("below", 15))
+        elif self.kind == "rate_of_change":
+            self.field = _RULE_FIELDS[spec["field"]]
+            self.max_per_s = float(spec["max_per_s"])
+        elif self.kind == "geofence":
+            self.polygon = np.asarray(spec["polygon"], dtype=np.float64)
+            self.absolute = bool(spec.get("absolute", False))
+            if self.polygon.ndim != 2 or self.polygon.shape[0] < 3 or self.polygon.shape[1] != 2:
+                raise ValueError(f"alert rule {self.name}: polygon needs at least 3 [lat, lon] points")
+            self._fences: dict[str, np.ndarray] = {}
+        elif self.kind != "anomaly":
+            raise ValueError(f"alert rule {self.name}: unknown type {self.kind!r}")
+
+    def fence(self, fleet_id: str) -> np.ndarray:
+        # Relative polygons are offsets from the fleet's centre.
+        fence = self._fences.get(fleet_id)
+        if fence is None:
+            fence = self.polygon if self.absolute else self.polygon + np.array(_fleet_center(fleet_id))
+            self._fences[fleet_id] = fence
+        return fence
+
+
+class _AlertRules:
+    # Rules are compiled once and evaluated over a whole batch of events with
+    # NumPy; the first matching rule (in file order) wins for each event, since
+    # two alerts of the same severity for one event would share a primary key.
+    # A rule with suppress_s does not fire again for the same device until
+    # that much event time has passed.
+    def __init__(self, specs: list[dict]):
+        self.rules = [_AlertRule(spec) for spec in specs]
+        self._with_history = any(r.kind == "rate_of_change" for r in self.rules)
+        self._ordinals: dict[str, int] = {}
+        self._prev_ts = np.full(0, np.nan)
+        self._prev = {r.field: np.full(0, np.nan) for r in self.rules if r.kind == "rate_of_change"}
+        self._last_fired: dict[tuple[str, str], datetime] = {}
+        self.suppressed = 0
+
+    @classmethod
+    def load(cls, path: str) -> "_AlertRules":
+        if not path:
+            return cls(DEFAULT_ALERT_RULES)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["rules"] if isinstance(data, dict) else data)
+
+    def evaluate(self, events: list) -> list:
+        # Returns, for each event, None or the matching rule.
+        n = len(events)
+        if not n or not self.rules:
+            return [None] * n
+
+        cols = {f: np.fromiter((e[f] for e in events), dtype=np.float64, count=n) for f in _RULE_FIELDS.values()}
+        if self._with_history:
+            prev_ts, prev = self._previous(events, cols)
+
+        fired = np.full(n, -1, dtype=np.int64)
+        for k, rule in enumerate(self.rules):
+            pending = fired < 0
+            if not pending.any():
+                break
+            if rule.kind in ("threshold", "low_battery"):
+                mask = rule.op(cols[rule.field], rule.value)
+            elif rule.kind == "anomaly":
+                mask = np.fromiter((bool(e[9]) for e in events), dtype=bool, count=n)
+            elif rule.kind == "rate_of_change":
+                dt = prev_ts[1] - prev_ts[0]
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    rate = np.abs(cols[rule.field] - prev[rule.field]) / dt
+                mask = (dt > 0) & (rate > rule.max_per_s)
+            else:
+                mask = np.zeros(n, dtype=bool)
+                fleets = np.array([e[0] for e in events], dtype=object)
+                for fleet_id in set(fleets.tolist()):
+                    rows = fleets == fleet_id
+                    mask[rows] = ~_points_in_polygon(cols[3][rows], cols[4][rows], rule.fence(fleet_id))
+            fired[pending & mask] = k
+
+        out: list = [None] * n
+        for i in np.flatnonzero(fired >= 0).tolist():
+            rule = self.rules[fired[i]]
+            e = events[i]
+            if rule.suppress:
+                key = (e[1], rule.name)
+                last = self._last_fired.get(key)
+                if last is not None and e[2] - last < rule.suppress:
+                    self.suppressed += 1
+                    continue
+                self._last_fired[key] = e[2]
+            out[i] = rule
+        return out
 
-        ins_device = session.prepare(
+    def _previous(self, events: list, cols: dict) -> tuple:
+        # Pairs every reading with the same device's previous one: within the
+        # batch after sorting by (device, ts), otherwise from earlier batches.
+        # Returns ((prev_ts, ts), {field: prev_value}) in batch order.
+        n = len(events)
+        ords = self._ordinals_of(events)
+        ts_s = np.fromiter((e[2].timestamp() for e in events), dtype=np.float64, count=n)
+        order = np.lexsort((ts_s, ords))
+        s_ords = ords[order]
+        first = np.ones(n, dtype=bool)
+        first[1:] = s_ords[1:] != s_ords[:-1]
+        last = np.ones(n, dtype=bool)
+        last[:-1] = first[1:]
+
+        def shifted(sorted_values: np.ndarray, history: np.ndarray) -> np.ndarray:
+            out = np.empty(n)
+            out[1:] = sorted_values[:-1]
+            out[first] = history[s_ords[first]]
+            history[s_ords[last]] = sorted_values[last]
+            unsorted = np.empty(n)
+            unsorted[order] = out
+            return unsorted
+
+        prev_ts = shifted(ts_s[order], self._prev_ts)
+        prev = {field: shifted(cols[field][order], history) for field, history in self._prev.items()}
+        return (prev_ts, ts_s), prev
+
+    def _ordinals_of(self, events: list) -> np.ndarray:
+        ordinals = self._ordinals
+        ords = np.fromiter((ordinals.setdefault(e[1], len(ordinals)) for e in events), dtype=np.int64, count=len(events))
+        grow = len(ordinals) - len(self._prev_ts)
+        if grow > 0:
+            pad = np.full(max(grow, len(self._prev_ts)), np.nan)
+            self._prev_ts = np.concatenate([self._prev_ts, pad])
+            for field in self._prev:
+                self._prev[field] = np.concatenate([self._prev[field], pad])
+        return ords
+
+
+def _fleet_bucketer(mode: str, buckets: int):
+    # Returns None for the unbucketed table, else a (device_id, ts) -> bucket
+    # function.
+    if mode == "none":
+        return None
+    if mode == "hour":
+        return lambda device_id, ts: ts.hour
+    if mode == "hash":
+        cache: dict[str, int] = {}
+
+        def by_device(device_id: str, ts: datetime) -> int:
+            bucket = cache.get(device_id)
+            if bucket is None:
+                bucket = cache[device_id] = zlib.crc32(device_id.encode()) % max(1, buckets)
+            return bucket
+
+        return by_device
+    raise ValueError(f"ETL_FLEET_BUCKETING must be none, hour or hash, got {mode!r}")
+
+
+def _prepare_statements(session) -> dict:
+    return {
+        "ins_device": session.prepare(
             "INSERT INTO devices_by_fleet (fleet_id, device_id, model, activated_at) VALUES (?, ?, ?, ?)"
-        )
-        ins_latest = session.prepare(
+        ),
+        "ins_latest": session.prepare(
             "INSERT INTO latest_telemetry_by_device (device_id, last_ts, lat, lon, speed_kmh, battery_pct, temp_c) VALUES (?, ?, ?, ?, ?, ?, ?)"
-        )
-        ins_tel_dev = session.prepare(
+        ),
+        "ins_tel_dev": session.prepare(
             "INSERT INTO telemetry_by_device_day (device_id, day, ts, lat, lon, speed_kmh, battery_pct, temp_c, zone) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
-        )
-        ins_tel_fleet = session.prepare(
+        ),
+        "ins_tel_fleet": session.prepare(
             "INSERT INTO telemetry_by_fleet_day (fleet_id, day, ts, device_id, lat, lon, speed_kmh, battery_pct, temp_c, zone) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-        )
-        ins_alert = session.prepare(
+            if FLEET_BUCKETING == "none"
+            else "INSERT INTO telemetry_by_fleet_day_bucketed (fleet_id, day, bucket, ts, device_id, lat, lon, speed_kmh, battery_pct, temp_c, zone) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        ),
+        "ins_alert": session.prepare(
             "INSERT INTO alerts_by_fleet_day (fleet_id, day, severity, ts, device_id, alert_type, message) VALUES (?, ?, ?, ?, ?, ?, ?)"
-        )
+        ),
+        "ins_rollup": session.prepare(
+            "INSERT INTO telemetry_rollup_by_fleet_day (fleet_id, day, minute, source, event_count, speed_sum, speed_max, battery_min, temp_max, active_devices, speed_hist) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        ),
+    }
 
-        devices_by_fleet = _build_devices()
-        state: dict[str, dict[str, float]] = {}
 
-        now = datetime.now(timezone.utc)
-        for fleet_id, devs in devices_by_fleet.items():
-            for device_id in devs:
-                lat0, lon0 = _fleet_center(fleet_id)
-                state[device_id] = {
-                    "lat": lat0 + random.uniform(-0.02, 0.02),
-                    "lon": lon0 + random.uniform(-0.02, 0.02),
-                    "battery": float(random.randint(60, 100)),
-                }
-                session.execute(ins_device, (fleet_id, device_id, "GPS-TX-1", now))
+def _shard_devices(devices_by_fleet: dict[str, list[str]], shard: int, shards: int) -> dict[str, list[str]]:
+    # Round-robin over the global device ordinal: deterministic across runs and
+    # balanced to within one device per shard.
+    m: dict[str, list[str]] = {}
+    ordinal = 0
+    for fleet_id, devs in devices_by_fleet.items():
+        for device_id in devs:
+            if ordinal % shards == shard:
+                m.setdefault(fleet_id, []).append(device_id)
+            ordinal += 1
+    return m
 
-        while True:
-            fleet_id = random.choice(FLEETS)
-            device_id = random.choice(devices_by_fleet[fleet_id])
 
-            ts = datetime.now(timezone.utc)
-            day = date.fromisoformat(ts.date().isoformat())
+def _setup_schema() -> None:
+    cluster, session = _connect()
+    try:
+        _ensure_keyspace(session)
+        _ensure_tables(session)
+    finally:
+        try:
+            session.shutdown()
+        except Exception:
+            pass
+        try:
+            cluster.shutdown()
+        except Exception:
+            pass
+
+
+def _report_stats(shard: int, stats: dict[str, int], elapsed: float, stats_queue) -> None:
+    if stats_queue is not None:
+        stats_queue.put((shard, stats["events"], stats["alerts"], elapsed))
+        return
+    print(f"[etl] events/s={stats['events'] / elapsed:.1f} alerts={stats['alerts']}")
+
+
+class _EventSink:
+    # Single write path shared by the live loop and the backfill. Events are
+    # (fleet_id, device_id, ts, lat, lon, speed, battery, temp_c, zone,
+    # is_anomaly, severity_idx) tuples.
+    def __init__(self, stmts: dict, writer: _AsyncWriter, batcher: _PartitionBatcher, rules: _AlertRules, shard: int = 0):
+        self._stmts = stmts
+        self._rules = rules
+        self._fleet_bucket = _fleet_bucketer(FLEET_BUCKETING, FLEET_BUCKETS)
+        self._writer = writer
+        self._batcher = batcher
+        self._latest = _LatestCache(writer, stmts["ins_latest"], LATEST_FLUSH_MS, LATEST_FLUSH_DIRTY)
+        self._rollup = _MinuteRollup(writer, stmts["ins_rollup"], _rollup_source(shard), ROLLUP_FLUSH_MS, ROLLUP_LATENESS_S)
+        self.stats = {"events": 0, "alerts": 0}
+        self.events_total = 0
+        self.alerts_total = {sev: 0 for sev in SEVERITIES}
+        self.tick_time = _LatencyHistogram()
+
+    def register_device(self, fleet_id: str, device_id: str, activated_at: datetime) -> None:
+        self._writer.submit(self._stmts["ins_device"], (fleet_id, device_id, "GPS-TX-1", activated_at), "ins_device")
+
+    def write(self, events, intended=None) -> None:
+        # intended: per-event scheduled start times (time.monotonic() clock);
+        # defaults to "now" for closed-loop callers.
+        latest = self._latest
+        rollup = self._rollup
+        ins_tel_dev = self._stmts["ins_tel_dev"]
+        ins_tel_fleet = self._stmts["ins_tel_fleet"]
+        ins_alert = self._stmts["ins_alert"]
+        batcher = self._batcher
+        writer = self._writer
+        stats = self.stats
+        fleet_bucket = self._fleet_bucket
+        events_before = stats["events"]
+        if intended is None:
+            intended = itertools.repeat(time.monotonic())
+
+        events = list(events)
+        alerts = self._rules.evaluate(events)
+
+        for (fleet_id, device_id, ts, lat, lon, speed, battery, temp_c, zone, is_anomaly, sev), t0, rule in zip(events, intended, alerts):
+            day = ts.date()
+            batcher.add("ins_tel_dev", (device_id, day), ins_tel_dev, (device_id, day, ts, lat, lon, speed, battery, temp_c, zone), t0)
+            if fleet_bucket is None:
+                batcher.add("ins_tel_fleet", (fleet_id, day), ins_tel_fleet, (fleet_id, day, ts, device_id, lat, lon, speed, battery, temp_c, zone), t0)
+            else:
+                bucket = fleet_bucket(device_id, ts)
+                batcher.add("ins_tel_fleet", (fleet_id, day, bucket), ins_tel_fleet, (fleet_id, day, bucket, ts, device_id, lat, lon, speed, battery, temp_c, zone), t0)
+            latest.put((device_id, ts, lat, lon, speed, battery, temp_c), t0)
+            rollup.add(fleet_id, device_id, ts, speed, battery, temp_c)
+            stats["events"] += 1
+
+            if rule is not None:
+                severity = SEVERITIES[sev] if rule.severity == "random" else rule.severity
+                writer.submit(ins_alert, (fleet_id, day, severity, ts, device_id, rule.alert_type, rule.message), "ins_alert", t0)
+                stats["alerts"] += 1
+                self.alerts_total[severity] = self.alerts_total.get(severity, 0) + 1
+
+        self.events_total += stats["events"] - events_before
+        self.poll()
+
+    def poll(self) -> None:
+        self._batcher.poll()
+        self._latest.poll()
+        self._rollup.poll()
+
+    def take_stats(self) -> dict[str, int]:
+        stats = self.stats
+        self.stats = {"events": 0, "alerts": 0}
+        return stats
+
+    def report_latency(self, shard: int, shards: int, cumulative: bool = False) -> None:
+        prefix = f"shard={shard} " if shards > 1 else ""
+        self._writer.latency.report(prefix + ("total " if cumulative else ""), cumulative)
+
+    @property
+    def alerts_suppressed(self) -> int:
+        return self._rules.suppressed
+
+    @property
+    def latest_coalesced(self) -> int:
+        return self._latest.coalesced
+
+    @property
+    def rollup_late(self) -> int:
+        return self._rollup.late
+
+    def rollup_state(self) -> dict:
+        return self._rollup.state()
+
+    def restore_rollup(self, state: dict) -> None:
+        self._rollup.restore(state)
+
+    def flush(self, final: bool = False) -> None:
+        if not final:
+            self._rollup.flush()
+            self._latest.flush()
+            self._batcher.flush()
+            self._writer.flush()
+            return
+
+        # Shutdown: every stage is sent even if some writes fail, then all the
+        # failures are raised together.
+        errors: list[Exception] = []
+        self._writer.defer_errors(True)
+        try:
+            for stage in (lambda: self._rollup.flush(final=True), self._latest.flush, self._batcher.flush):
+                try:
+                    stage()
+                except Exception as exc:
+                    errors.append(exc)
+        finally:
+            self._writer.defer_errors(False)
+        errors += self._writer.drain()
+        if errors:
+            raise ExceptionGroup(f"{len(errors)} write(s) failed during the final flush", errors)
+
+
+def _tick_events(devices: _DeviceState, idx: np.ndarray, rng: np.random.Generator, timestamps, tick_time: _LatencyHistogram | None = None):
+    started = time.perf_counter()
+    anomaly, severity_idx = devices.tick(idx, rng)
+    fleet_idx = devices.fleet_idx[idx].tolist()
+    events = zip(
+        [devices.fleets[f] for f in fleet_idx],
+        [devices.device_ids[i] for i in idx.tolist()],
+        timestamps,
+        devices.lat[idx].tolist(),
+        devices.lon[idx].tolist(),
+        devices.speed[idx].tolist(),
+        devices.battery[idx].astype(np.int64).tolist(),
+        devices.temp[idx].tolist(),
+        [devices.zones[f] for f in fleet_idx],
+        anomaly.tolist(),
+        severity_idx.tolist(),
+    )
+    if tick_time is not None:
+        tick_time.record(time.perf_counter() - started)
+    return events
+
+
+def _run_live(sink: _EventSink, rng: np.random.Generator, shard: int, shards: int, stats_queue) -> None:
+    devices_by_fleet = _shard_devices(_build_devices(), shard, shards)
+    if not devices_by_fleet:
+        print(f"[etl] worker {shard}/{shards}: no devices assigned, exiting")
+        return
+
+    devices = _DeviceState(devices_by_fleet, rng)
+    now = datetime.now(timezone.utc)
+    for i, device_id in enumerate(devices.device_ids):
+        sink.register_device(devices.fleets[devices.fleet_idx[i]], device_id, now)
+
+    if TARGET_RATE > 0:
+        _run_open_loop(sink, devices, rng, shard, shards, stats_queue)
+        return
+    if REPORT_INTERVAL_MS > 0:
+        _run_scheduled(sink, devices, rng, shard, shards, stats_queue)
+        return
+
+    tick_batch = max(1, min(TICK_BATCH, len(devices)))
+    last_report = time.monotonic()
+
+    while True:
+        idx = rng.choice(len(devices), size=tick_batch, replace=False)
+        ts = datetime.now(timezone.utc)
+        sink.write(_tick_events(devices, idx, rng, itertools.repeat(ts), sink.tick_time))
+
+        elapsed = time.monotonic() - last_report
+        if elapsed >= STATS_INTERVAL_S:
+            _report_stats(shard, sink.take_stats(), elapsed, stats_queue)
+            sink.report_latency(shard, shards)
+            last_report = time.monotonic()
+
+        if INTERVAL_MS > 0:
+            time.sleep(INTERVAL_MS / 1000.0)
+
+
+def _run_scheduled(sink: _EventSink, devices: _DeviceState, rng: np.random.Generator, shard: int, shards: int, stats_queue) -> None:
+    # Each report is stamped with its due time (event time) and timed from it,
+    # like the open loop, so a slow cluster shows up as latency and lag rather
+    # than as devices going quiet.
+    mono0 = time.monotonic()
+    wall0 = datetime.now(timezone.utc)
+    scheduler = _DeviceScheduler(len(devices), REPORT_INTERVAL_MS / 1000.0, REPORT_SPREAD, REPORT_JITTER, rng, mono0)
+    limit = max(1, SCHEDULE_MAX_BATCH)
+    last_report = mono0
+    lag = 0.0
+
+    while True:
+        now = time.monotonic()
+        idx, due = scheduler.pop_due(now, rng, limit)
+        if len(idx):
+            due_s = due.tolist()
+            timestamps = [wall0 + timedelta(seconds=t - mono0) for t in due_s]
+            sink.write(_tick_events(devices, idx, rng, timestamps, sink.tick_time), due_s)
+            lag = now - due_s[0]
+        else:
+            # Wake up at least twice a second so buffered writes still flush.
+            time.sleep(min(0.5, max(0.0, scheduler.next_due() - now)))
+            sink.poll()
 
-            s = state[device_id]
-            s["lat"] = float(s["lat"]) + random.uniform(-0.0015, 0.0015)
-            s["lon"] = float(s["lon"]) + random.uniform(-0.0015, 0.0015)
-            s["battery"] = max(0.0, float(s["battery"]) - random.uniform(0.0, 0.05))
+        elapsed = time.monotonic() - last_report
+        if elapsed >= STATS_INTERVAL_S:
+            _report_stats(shard, sink.take_stats(), elapsed, stats_queue)
+            if lag > 0.1:
+                print(f"[etl] shard={shard} behind schedule by {lag:.2f}s")
+            sink.report_latency(shard, shards)
+            last_report = time.monotonic()
 
-            speed = max(0.0, random.gauss(35.0, 12.0))
-            temp_c = random.gauss(28.0, 4.0)
-            if random.random() < 0.01:
-                temp_c += random.uniform(10.0, 20.0)
 
-            zone = "PARIS-A" if fleet_id == "FLEET_PARIS" else "LYON-A"
+def _run_open_loop(sink: _EventSink, devices: _DeviceState, rng: np.random.Generator, shard: int, shards: int, stats_queue) -> None:
+    # Open loop: event k is due at t0 + k / rate regardless of how fast the
+    # cluster answers. When the writer falls behind, due events are emitted in
+    # catch-up batches and their latency still counts from the due time, so
+    # queueing shows up in the histograms (no coordinated omission).
+    rate = TARGET_RATE / max(1, shards)
+    period = 1.0 / rate
+    t0 = time.monotonic()
+    emitted = 0
+    last_report = t0
 
-            session.execute(ins_tel_dev, (device_id, day, ts, s["lat"], s["lon"], speed, int(s["battery"]), temp_c, zone))
-            session.execute(ins_tel_fleet, (fleet_id, day, ts, device_id, s["lat"], s["lon"], speed, int(s["battery"]), temp_c, zone))
-            session.execute(ins_latest, (device_id, ts, s["lat"], s["lon"], speed, int(s["battery"]), temp_c))
+    while True:
+        now = time.monotonic()
+        due = int((now - t0) * rate) + 1 - emitted
+        if due <= 0:
+            time.sleep(max(0.0, t0 + emitted * period - now))
+            continue
 
-            if temp_c >= 40.0 or random.random() < ALERT_PROB:
-                severity = "HIGH" if temp_c >= 40.0 else random.choice(["LOW", "MED", "HIGH"])
-                alert_type = "TEMP_HIGH" if temp_c >= 40.0 else "GEOFENCE"
-                message = "Température > 40C" if temp_c >= 40.0 else "Anomalie détectée"
-                session.execute(ins_alert, (fleet_id, day, severity, ts, device_id, alert_type, message))
+        n = min(due, len(devices))
+        idx = rng.choice(len(devices), size=n, replace=False)
+        ts = datetime.now(timezone.utc)
+        intended = [t0 + (emitted + k) * period for k in range(n)]
+        sink.write(_tick_events(devices, idx, rng, itertools.repeat(ts), sink.tick_time), intended)
+        emitted += n
 
-            time.sleep(max(0.05, INTERVAL_MS / 1000.0))
+        elapsed = time.monotonic() - last_report
+        if elapsed >= STATS_INTERVAL_S:
+            lag = time.monotonic() - (t0 + emitted * period)
+            _report_stats(shard, sink.take_stats(), elapsed, stats_queue)
+            if lag > 0.1:
+                print(f"[etl] shard={shard} behind schedule by {lag:.2f}s")
+            sink.report_latency(shard, shards)
+            last_report = time.monotonic()
+
+
+def _parse_ts(value: str) -> datetime:
+    ts = datetime.fromisoformat(value.strip())
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
+def _load_checkpoint(path: str, key: dict) -> tuple[int, dict | None]:
+    if not path or not os.path.exists(path):
+        return 0, None
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("key") != key:
+        print(f"[etl] checkpoint {path} belongs to another backfill, ignoring it")
+        return 0, None
+    return int(data.get("position", 0)), data.get("rollup")
+
+
+def _save_checkpoint(path: str, key: dict, position: int, done: bool = False, rollup: dict | None = None) -> None:
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "position": position, "done": done, "rollup": rollup}, f)
+    os.replace(tmp, path)
+
+
+def _generated_backfill(devices: _DeviceState, rng: np.random.Generator, start: datetime, end: datetime, step: timedelta, position: int, tick_time: _LatencyHistogram):
+    # Every device reports once per step; reports are spread evenly across the
+    # step so that the per-partition clustering keys do not collide.
+    n = len(devices)
+    idx = np.arange(n)
+    offsets = [timedelta(seconds=step.total_seconds() * i / n) for i in range(n)]
+    step_ts = start + step * position
+    while step_ts < end:
+        position += 1
+        events = _tick_events(devices, idx, rng, [step_ts + o for o in offsets], tick_time)
+        yield position, step_ts, [e for e in events if e[2] < end]
+        step_ts = start + step * position
+
+
+def _read_source_rows(path: str):
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=BACKFILL_CHUNK):
+            yield from batch.to_pylist()
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def _file_backfill(paths: list[str], start: datetime, end: datetime, shard: int, shards: int, position: int):
+    # Rows need fleet_id, device_id, ts, lat, lon, speed_kmh, battery_pct and
+    # temp_c columns; zone is optional. The position is the number of source
+    # rows already consumed across all files.
+    row_no = 0
+    chunk = []
+    for path in paths:
+        for row in _read_source_rows(path):
+            row_no += 1
+            if row_no <= position:
+                continue
+            device_id = str(row["device_id"])
+            if shards > 1 and zlib.crc32(device_id.encode()) % shards != shard:
+                continue
+            ts = row["ts"]
+            ts = _parse_ts(ts) if isinstance(ts, str) else ts
+            if ts.tzinfo is None:
+                ts = ts.replace(tzinfo=timezone.utc)
+            if ts < start or ts >= end:
+                continue
+            fleet_id = str(row["fleet_id"])
+            chunk.append((
+                fleet_id,
+                device_id,
+                ts,
+                float(row["lat"]),
+                float(row["lon"]),
+                float(row["speed_kmh"]),
+                int(float(row["battery_pct"])),
+                float(row["temp_c"]),
+                row.get("zone") or _fleet_zone(fleet_id),
+                False,
+                0,
+            ))
+            if len(chunk) >= BACKFILL_CHUNK:
+                yield row_no, ts, chunk
+                chunk = []
+    if chunk:
+        yield row_no, chunk[-1][2], chunk
+    elif row_no > position:
+        yield row_no, end, []
+
+
+def _run_backfill(sink: _EventSink, rng: np.random.Generator, shard: int, shards: int, stats_queue) -> None:
+    if not BACKFILL_START:
+        raise ValueError("ETL_BACKFILL_START is required when ETL_MODE=backfill")
+    start = _parse_ts(BACKFILL_START)
+    end = _parse_ts(BACKFILL_END) if BACKFILL_END else datetime.now(timezone.utc)
+    step = timedelta(milliseconds=BACKFILL_STEP_MS)
+    sources = _env_list("ETL_BACKFILL_SOURCE", "")
+    checkpoint = BACKFILL_CHECKPOINT
+    if checkpoint and shards > 1:
+        checkpoint = f"{checkpoint}.{shard}"
+
+    key = {"start": start.isoformat(), "end": end.isoformat(), "sources": sources, "shard": shard, "shards": shards}
+    if not sources:
+        key["step_ms"] = BACKFILL_STEP_MS
+    position, rollup = _load_checkpoint(checkpoint, key)
+    if position:
+        print(f"[etl] backfill resuming from position {position}")
+    if rollup:
+        # The minutes still open at the checkpoint already hold the events
+        # before it; replaying the rest completes them instead of overwriting
+        # them with partial counts.
+        sink.restore_rollup(rollup)
+
+    if sources:
+        chunks = _file_backfill(sources, start, end, shard, shards, position)
+        total_steps = 0
+    else:
+        devices_by_fleet = _shard_devices(_build_devices(), shard, shards)
+        if not devices_by_fleet:
+            print(f"[etl] worker {shard}/{shards}: no devices assigned, exiting")
+            return
+        devices = _DeviceState(devices_by_fleet, rng)
+        for i, device_id in enumerate(devices.device_ids):
+            sink.register_device(devices.fleets[devices.fleet_idx[i]], device_id, start)
+        chunks = _generated_backfill(devices, rng, start, end, step, position, sink.tick_time)
+        total_steps = max(1, math.ceil((end - start) / step))
+
+    seen_devices: set[str] = set()
+    started = time.monotonic()
+    last_report = last_checkpoint = started
+    sent = 0
+    event_ts = start
+    for position, event_ts, events in chunks:
+        if sources:
+            for e in events:
+                if e[1] not in seen_devices:
+                    seen_devices.add(e[1])
+                    sink.register_device(e[0], e[1], e[2])
+        sink.write(events)
+        sent += len(events)
+
+        if BACKFILL_RATE > 0:
+            ahead = sent / BACKFILL_RATE - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+        now = time.monotonic()
+        if now - last_checkpoint >= BACKFILL_CHECKPOINT_S:
+            # Only checkpoint what the cluster has acknowledged; replays after a
+            # crash are idempotent upserts.
+            sink.flush()
+            _save_checkpoint(checkpoint, key, position, rollup=sink.rollup_state())
+            last_checkpoint = now
+
+        if now - last_report >= STATS_INTERVAL_S:
+            elapsed = now - last_report
+            stats = sink.take_stats()
+            if stats_queue is not None:
+                _report_stats(shard, stats, elapsed, stats_queue)
+            progress = f" {100.0 * position / total_steps:.1f}%" if total_steps else ""
+            print(
+                f"[etl] backfill shard={shard} at={event_ts.isoformat()}{progress} "
+                f"events={sent} events/s={stats['events'] / elapsed:.1f} avg/s={sent / (now - started):.1f}"
+            )
+            sink.report_latency(shard, shards)
+            last_report = now
+
+    sink.flush(final=True)
+    _save_checkpoint(checkpoint, key, position, done=True)
+    elapsed = max(1e-9, time.monotonic() - started)
+    print(f"[etl] backfill shard={shard} done: events={sent} in {elapsed:.1f}s ({sent / elapsed:.1f} events/s)")
+
+
+METRICS_BUCKETS_S = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+def _prom_histogram(lines: list[str], name: str, labels: str, hist: _LatencyHistogram) -> None:
+    sep = "," if labels else ""
+    for bound, count in zip(METRICS_BUCKETS_S, hist.cumulative(METRICS_BUCKETS_S)):
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+    lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {hist.count}')
+    lines.append(f"{name}_sum{{{labels}}} {hist.sum_us / 1_000_000:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+
+def _render_metrics(sink: _EventSink, writer: _AsyncWriter, spill: _SpillQueue | None, session, shard: int) -> str:
+    hists, errors = writer.latency.snapshot()
+    s = f'shard="{shard}"'
+    lines = [
+        "# HELP etl_events_total Telemetry events generated.",
+        "# TYPE etl_events_total counter",
+        f"etl_events_total{{{s}}} {sink.events_total}",
+        "# HELP etl_alerts_total Alerts written, by severity.",
+        "# TYPE etl_alerts_total counter",
+    ]
+    for severity, count in sorted(sink.alerts_total.items()):
+        lines.append(f'etl_alerts_total{{{s},severity="{severity}"}} {count}')
+
+    lines += [
+        "# HELP etl_alerts_suppressed_total Alerts dropped by per-device rule suppression.",
+        "# TYPE etl_alerts_suppressed_total counter",
+        f"etl_alerts_suppressed_total{{{s}}} {sink.alerts_suppressed}",
+        "# HELP etl_writes_total Completed write requests, by statement.",
+        "# TYPE etl_writes_total counter",
+    ]
+    for label, hist in sorted(hists.items()):
+        lines.append(f'etl_writes_total{{{s},statement="{label}"}} {hist.count}')
+    lines += [
+        "# HELP etl_write_errors_total Failed write requests, by statement and error type.",
+        "# TYPE etl_write_errors_total counter",
+    ]
+    for (label, error), count in sorted(errors.items()):
+        lines.append(f'etl_write_errors_total{{{s},statement="{label}",error="{error}"}} {count}')
+    lines += [
+        "# HELP etl_write_latency_seconds Intended-start to completion latency, by statement.",
+        "# TYPE etl_write_latency_seconds histogram",
+    ]
+    for label, hist in sorted(hists.items()):
+        _prom_histogram(lines, "etl_write_latency_seconds", f'{s},statement="{label}"', hist)
+
+    lines += [
+        "# HELP etl_latest_coalesced_total latest_telemetry_by_device upserts absorbed by the write-behind cache.",
+        "# TYPE etl_latest_coalesced_total counter",
+        f"etl_latest_coalesced_total{{{s}}} {sink.latest_coalesced}",
+        "# HELP etl_rollup_late_events_total Events that arrived after their minute rollup was closed.",
+        "# TYPE etl_rollup_late_events_total counter",
+        f"etl_rollup_late_events_total{{{s}}} {sink.rollup_late}",
+        "# HELP etl_spilled_rows_total Rows written to the local spill log after a failed write.",
+        "# TYPE etl_spilled_rows_total counter",
+        f"etl_spilled_rows_total{{{s}}} {spill.spilled if spill else 0}",
+        "# HELP etl_replayed_rows_total Spilled rows replayed to the cluster.",
+        "# TYPE etl_replayed_rows_total counter",
+        f"etl_replayed_rows_total{{{s}}} {spill.replayed if spill else 0}",
+        "# HELP etl_spill_pending_bytes Bytes waiting in the spill log.",
+        "# TYPE etl_spill_pending_bytes gauge",
+        f"etl_spill_pending_bytes{{{s}}} {spill.pending_bytes if spill else 0}",
+        "# HELP etl_writes_in_flight Write requests currently outstanding.",
+        "# TYPE etl_writes_in_flight gauge",
+        f"etl_writes_in_flight{{{s}}} {writer.in_flight}",
+        "# HELP etl_tick_seconds Time spent generating one tick of events.",
+        "# TYPE etl_tick_seconds histogram",
+    ]
+    _prom_histogram(lines, "etl_tick_seconds", s, sink.tick_time.copy())
+
+    lines += [
+        "# HELP etl_pool_open_connections Driver connections open per host.",
+        "# TYPE etl_pool_open_connections gauge",
+        "# HELP etl_pool_in_flight Driver requests in flight per host.",
+        "# TYPE etl_pool_in_flight gauge",
+    ]
+    for host, state in session.get_pool_state().items():
+        h = f'{s},host="{host.address}",dc="{host.datacenter}"'
+        lines.append(f"etl_pool_open_connections{{{h}}} {state.get('open_count', 0)}")
+        lines.append(f"etl_pool_in_flight{{{h}}} {sum(state.get('in_flights', []))}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def _start_metrics_server(port: int, render) -> http.server.ThreadingHTTPServer:
+    server = http.server.ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    server.daemon_threads = True
+    server.render = render
+    threading.Thread(target=server.serve_forever, name="etl-metrics", daemon=True).start()
+    print(f"[etl] metrics on :{port}/metrics")
+    return server
+
+
+def _on_sigterm(signum, _frame) -> None:
+    # docker stop and the supervisor send SIGTERM; turn it into SystemExit so
+    # the finally blocks flush buffered rows. A repeated signal is ignored
+    # while that flush runs.
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise SystemExit(128 + signum)
+
+
+def _report_flush_errors(shard: int, exc: Exception) -> None:
+    failures: dict[str, int] = {}
+    for err in getattr(exc, "exceptions", [exc]):
+        name = f"{type(err).__name__}: {err}"
+        failures[name] = failures.get(name, 0) + 1
+    for name, count in failures.items():
+        print(f"[etl] worker {shard} final flush: {count}x {name}")
+
+
+def _run_worker(shard: int, shards: int, stats_queue=None) -> None:
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    seed = int(os.getenv("ETL_SEED", "0"))
+    rng = np.random.default_rng(seed + shard if seed else None)
+
+    cluster, session = _connect()
+    spill = None
+    if SPILL_DIR:
+        spill = _SpillQueue(os.path.join(SPILL_DIR, f"shard-{shard}"), SPILL_MAX_MB << 20, SPILL_SEGMENT_MB << 20)
+    writer = _AsyncWriter(session, MAX_IN_FLIGHT, spill)
+    batcher = _PartitionBatcher(writer, BATCH_WINDOW_MS, BATCH_MAX_ROWS, BATCH_MAX_BYTES)
+    sink = None
+    drainer = None
+    metrics_server = None
+    try:
+        session.execute(f"USE {CASSANDRA_KEYSPACE}")
+
+        stmts = _prepare_statements(session)
+        sink = _EventSink(stmts, writer, batcher, _AlertRules.load(ALERT_RULES_PATH), shard)
+        if spill is not None:
+            drainer = _SpillDrainer(session, stmts, spill, writer, SPILL_DRAIN_CONCURRENCY)
+            drainer.start()
+        if METRICS_PORT > 0:
+            # One endpoint per worker process: port + shard.
+            metrics_server = _start_metrics_server(
+                METRICS_PORT + shard, lambda: _render_metrics(sink, writer, spill, session, shard)
+            )
+        if MODE == "backfill":
+            _run_backfill(sink, rng, shard, shards, stats_queue)
+        else:
+            _run_live(sink, rng, shard, shards, stats_queue)
     finally:
+        try:
+            if sink is not None:
+                sink.flush(final=True)
+        except Exception as exc:
+            _report_flush_errors(shard, exc)
+        if sink is not None:
+            sink.report_latency(shard, shards, cumulative=True)
+        if drainer is not None:
+            drainer.stop()
+        if spill is not None:
+            spill.close()
+            if spill.pending_bytes:
+                print(f"[etl] worker {shard}: {spill.pending_bytes} spilled bytes left for the next run")
+        if metrics_server is not None:
+            metrics_server.shutdown()
         try:
             session.shutdown()
         except Exception:
@@ -169,5 +1793,83 @@ def main():
             pass
 
 
+def _supervise(shards: int) -> None:
+    # Workers are spawned (not forked) so that no driver state leaks from the
+    # parent; each one opens its own Cluster/Session.
+    ctx = multiprocessing.get_context("spawn")
+    stats_queue = ctx.Queue()
+    workers: dict[int, multiprocessing.Process] = {}
+    started: dict[int, float] = {}
+    delays: dict[int, float] = {}
+    restart_at: dict[int, float] = {}
+
+    def start(shard: int) -> None:
+        proc = ctx.Process(target=_run_worker, args=(shard, shards, stats_queue), name=f"etl-worker-{shard}", daemon=True)
+        proc.start()
+        workers[shard] = proc
+        started[shard] = time.monotonic()
+
+    for shard in range(shards):
+        start(shard)
+
+    totals = {"events": 0, "alerts": 0}
+    rates: dict[int, float] = {}
+    last_report = time.monotonic()
+    try:
+        while True:
+            try:
+                shard, events, alerts, elapsed = stats_queue.get(timeout=1.0)
+                totals["events"] += events
+                totals["alerts"] += alerts
+                rates[shard] = events / elapsed if elapsed > 0 else 0.0
+            except queue.Empty:
+                pass
+
+            if all(p.exitcode == 0 for p in workers.values()):
+                print(f"[etl] all workers finished: events={totals['events']} alerts={totals['alerts']}")
+                return
+
+            now = time.monotonic()
+            for shard, proc in list(workers.items()):
+                if proc.is_alive() or proc.exitcode == 0:
+                    continue
+                if shard in restart_at:
+                    if now >= restart_at[shard]:
+                        del restart_at[shard]
+                        start(shard)
+                    continue
+                if now - started[shard] >= RESTART_RESET_S:
+                    delay = RESTART_BACKOFF_S
+                else:
+                    delay = min(delays.get(shard, RESTART_BACKOFF_S / 2) * 2, RESTART_BACKOFF_MAX_S)
+                delays[shard] = delay
+                restart_at[shard] = now + delay
+                print(f"[etl] worker {shard} exited with code {proc.exitcode}, restarting in {delay:.1f}s")
+                rates.pop(shard, None)
+
+            if time.monotonic() - last_report >= STATS_INTERVAL_S:
+                alive = sum(1 for p in workers.values() if p.is_alive())
+                print(
+                    f"[etl] workers={alive}/{shards} events/s={sum(rates.values()):.1f} "
+                    f"events={totals['events']} alerts={totals['alerts']}"
+                )
+                last_report = time.monotonic()
+    finally:
+        for proc in workers.values():
+            if proc.is_alive():
+                proc.terminate()
+        for proc in workers.values():
+            proc.join(timeout=SHUTDOWN_TIMEOUT_S)
+
+
+def main():
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    _setup_schema()
+    if WORKERS <= 1:
+        _run_worker(0, 1)
+    else:
+        _supervise(WORKERS)
+
+
 if __name__ == "__main__":
     main()
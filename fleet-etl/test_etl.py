@@ -0,0 +1,17 @@
+import etl
+
+
+def test_latency_histogram_cumulative_counts_samples_on_bounds():
+    hist = etl._LatencyHistogram()
+    for seconds in (0.0002, 0.0005, 0.0007, 0.001, 0.002, 0.0025):
+        hist.record(seconds)
+    assert hist.cumulative([0.0005, 0.001, 0.0025]) == [2, 4, 6]
+
+
+def test_latency_histogram_cumulative_is_monotonic_and_complete():
+    hist = etl._LatencyHistogram()
+    for us in range(0, 20_000, 7):
+        hist.record(us / 1_000_000)
+    counts = hist.cumulative(etl.METRICS_BUCKETS_S)
+    assert counts == sorted(counts)
+    assert hist.cumulative([60.0]) == [hist.count]
@@ -8,8 +8,10 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 
-from cassandra.cluster import Cluster
+from cassandra import ConsistencyLevel
+from cassandra.cluster import EXEC_PROFILE_DEFAULT, Cluster, ExecutionProfile
 from cassandra.auth import PlainTextAuthProvider
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
 
 
 # -------------------------------
@@ -20,6 +22,12 @@ CASSANDRA_PORT = int(os.getenv("CASSANDRA_PORT", "9042"))
 CASSANDRA_USER = os.getenv("CASSANDRA_USER", "")
 CASSANDRA_PASSWORD = os.getenv("CASSANDRA_PASSWORD", "")
 CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "")
+CASSANDRA_LOCAL_DC = os.getenv("CASSANDRA_LOCAL_DC", "dc1")
+CASSANDRA_REMOTE_HOSTS_PER_DC = int(os.getenv("CASSANDRA_REMOTE_HOSTS_PER_DC", "0"))
+CASSANDRA_CONSISTENCY = os.getenv("CASSANDRA_CONSISTENCY", "LOCAL_ONE").strip().upper()
+CASSANDRA_REQUEST_TIMEOUT_S = float(os.getenv("CASSANDRA_REQUEST_TIMEOUT_S", "10"))
+CASSANDRA_COMPRESSION = os.getenv("CASSANDRA_COMPRESSION", "lz4").strip().lower()
+CASSANDRA_EXECUTOR_THREADS = int(os.getenv("CASSANDRA_EXECUTOR_THREADS", "2"))
 
 app = FastAPI(title="CQL Web Editor")
 
@@ -59,25 +67,40 @@ def is_session_active() -> bool:
     return session is not None and not session.is_shutdown
 
 
+def build_cluster(contact_points: List[str], port: int, username: str = "", password: str = "") -> Cluster:
+    """Construit un Cluster avec routage token-aware sur le DC local et le profil d'exécution configuré."""
+    profile = ExecutionProfile(
+        load_balancing_policy=TokenAwarePolicy(
+            DCAwareRoundRobinPolicy(
+                local_dc=CASSANDRA_LOCAL_DC or None,
+                used_hosts_per_remote_dc=CASSANDRA_REMOTE_HOSTS_PER_DC,
+            )
+        ),
+        consistency_level=ConsistencyLevel.name_to_value[CASSANDRA_CONSISTENCY],
+        request_timeout=CASSANDRA_REQUEST_TIMEOUT_S,
+    )
+    kwargs: Dict[str, Any] = {
+        "contact_points": contact_points,
+        "port": port,
+        "execution_profiles": {EXEC_PROFILE_DEFAULT: profile},
+        "compression": CASSANDRA_COMPRESSION if CASSANDRA_COMPRESSION not in ("", "none") else False,
+        "executor_threads": CASSANDRA_EXECUTOR_THREADS,
+    }
+    if username and password:
+        kwargs["auth_provider"] = PlainTextAuthProvider(username=username, password=password)
+    return Cluster(**kwargs)
+
+
 @app.on_event("startup")
 def on_startup() -> None:
     global cluster, session
 
-    if CASSANDRA_USER and CASSANDRA_PASSWORD:
-        auth = PlainTextAuthProvider(
-            username=CASSANDRA_USER,
-            password=CASSANDRA_PASSWORD,
-        )
-        cluster = Cluster(
-            contact_points=CASSANDRA_CONTACT_POINTS,
-            port=CASSANDRA_PORT,
-            auth_provider=auth,
-        )
-    else:
-        cluster = Cluster(
-            contact_points=CASSANDRA_CONTACT_POINTS,
-            port=CASSANDRA_PORT,
-        )
+    cluster = build_cluster(
+        CASSANDRA_CONTACT_POINTS,
+        CASSANDRA_PORT,
+        CASSANDRA_USER,
+        CASSANDRA_PASSWORD,
+    )
 
     session = cluster.connect()
     if CASSANDRA_KEYSPACE:
@@ -120,11 +143,7 @@ def reconnect_cassandra(hosts: str, port: int, username: str = "", password: str
     if not contact_points:
         raise ValueError("Au moins un hôte doit être spécifié.")
     
-    if username and password:
-        auth = PlainTextAuthProvider(username=username, password=password)
-        cluster = Cluster(contact_points=contact_points, port=port, auth_provider=auth)
-    else:
-        cluster = Cluster(contact_points=contact_points, port=port)
+    cluster = build_cluster(contact_points, port, username, password)
     
     session = cluster.connect()
     if keyspace:
@@ -139,6 +158,8 @@ async def get_config():
         "port": CASSANDRA_PORT,
         "username": CASSANDRA_USER,
         "keyspace": CASSANDRA_KEYSPACE,
+        "local_dc": CASSANDRA_LOCAL_DC,
+        "consistency": CASSANDRA_CONSISTENCY,
         "connected": is_session_active(),
     }
 